@@ -38,3 +38,39 @@ class DoesNotHavePermissionForGoogleCloudSecret(
     GoogleCloudAuthenticationError
 ):
     """Ошибка: Недостаточно прав для доступа к Google Cloud Secret."""
+
+
+class TaskDispatchError(Exception):
+    """Basic class for all errors associated with background tasks."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class TaskHandlerNotRegistered(TaskDispatchError):
+    """Error: no handler is registered for the task name."""
+
+
+class TaskEnqueueFailed(TaskDispatchError):
+    """Error: the task could not be put into the queue."""
+
+
+class StorageError(Exception):
+    """Basic class for all errors associated with media storage."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class StorageObjectNotFound(StorageError):
+    """Error: the requested object does not exist in storage."""
+
+
+class InvalidByteRange(StorageError):
+    """Error: the requested byte range can not be satisfied."""
+
+
+class TransientStorageError(StorageError):
+    """Error: the storage backend failed temporarily, retrying may help."""
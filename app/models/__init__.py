@@ -0,0 +1,6 @@
+from app.models.athlete import Athlete
+from app.models.base_model import BaseModel
+from app.models.leaderboard_entry import LeaderboardEntry
+from app.models.result import Result
+
+__all__ = ["Athlete", "BaseModel", "LeaderboardEntry", "Result"]
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import Date, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.models.base_model import BaseModel
+
+if TYPE_CHECKING:
+    from app.models.result import Result
+
+
+class Athlete(BaseModel):
+    __tablename__ = "athletes"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    first_name: Mapped[str] = mapped_column(String(100))
+    last_name: Mapped[str] = mapped_column(String(100))
+    birth_date: Mapped[Optional[date]] = mapped_column(Date)
+
+    results: Mapped[list[Result]] = relationship(
+        back_populates="athlete", passive_deletes=True
+    )
@@ -0,0 +1,33 @@
+from sqlalchemy import Float, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base_model import BaseModel
+
+
+class LeaderboardEntry(BaseModel):
+    """
+    Best result of an athlete on one leaderboard.
+
+    A lower 'score' is always better: for events where a higher value
+    wins the score is the negated value.
+    """
+
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        Index(
+            "ix_leaderboard_entries_board_score",
+            "event",
+            "season",
+            "age_group",
+            "score",
+        ),
+    )
+
+    event: Mapped[str] = mapped_column(String(50), primary_key=True)
+    season: Mapped[int] = mapped_column(Integer, primary_key=True)
+    age_group: Mapped[str] = mapped_column(String(10), primary_key=True)
+    athlete_id: Mapped[int] = mapped_column(
+        ForeignKey("athletes.id", ondelete="CASCADE"), primary_key=True
+    )
+    score: Mapped[float] = mapped_column(Float)
+    value: Mapped[float] = mapped_column(Float)
@@ -0,0 +1,66 @@
+"""Add athlete search indexes
+
+Revision ID: b5d92e6f0c18
+Revises: 8e4b0d5a71c2
+Create Date: 2026-10-19 16:45:09.772310
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d92e6f0c18"
+down_revision: Union[str, None] = "8e4b0d5a71c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The expressions must match the ones used by AthleteSearchService.
+FULL_NAME = "(first_name || ' ' || last_name)"
+
+
+def upgrade() -> None:
+    # 'get_context' also works in offline mode, where there is no bind.
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Indexes built concurrently do not block writes to 'athletes', but
+    # can not be built inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_athletes_full_name_trgm",
+            "athletes",
+            [sa.text(f"{FULL_NAME} gin_trgm_ops")],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_athletes_full_name_tsvector",
+            "athletes",
+            [sa.text(f"to_tsvector('simple', {FULL_NAME})")],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_athletes_full_name_tsvector",
+            table_name="athletes",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_athletes_full_name_trgm",
+            table_name="athletes",
+            postgresql_concurrently=True,
+        )
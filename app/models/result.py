@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, String, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.models.base_model import BaseModel
+
+if TYPE_CHECKING:
+    from app.models.athlete import Athlete
+
+
+class Result(BaseModel):
+    __tablename__ = "results"
+    __table_args__ = (
+        Index(
+            "ix_results_event_athlete_id_recorded_at",
+            "event",
+            "athlete_id",
+            "recorded_at",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    athlete_id: Mapped[int] = mapped_column(
+        ForeignKey("athletes.id", ondelete="CASCADE")
+    )
+    event: Mapped[str] = mapped_column(String(50))
+    value: Mapped[float] = mapped_column(Float)
+    recorded_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now()
+    )
+
+    athlete: Mapped[Athlete] = relationship(back_populates="results")
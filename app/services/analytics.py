@@ -0,0 +1,463 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Float, Select, cast, extract, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.result import Result
+from app.services.events import HIGHER_IS_BETTER_EVENTS
+from app.utils.decorators import memory_profiler_class
+
+logger = logging.getLogger(__name__)
+
+# Keeps the number of bound parameters of a single 'IN' query well below
+# the limits of asyncpg and SQLite.
+QUERY_BATCH_SIZE = 5000
+
+CacheKey = tuple[str, int]
+ResultVersion = tuple[datetime, int]
+
+ROW_DTYPE = np.dtype(
+    [
+        ("athlete_id", np.int64),
+        ("value", np.float64),
+        ("recorded_at", np.float64),
+    ]
+)
+
+
+class ResultSeries:
+    """
+    Results of many athletes in columnar form.
+
+    Rows are sorted by athlete and then by the time they were recorded,
+    so the results of one athlete form a contiguous segment.
+    """
+
+    __slots__ = ("athlete_ids", "values", "recorded_at")
+
+    def __init__(
+        self,
+        athlete_ids: np.ndarray,
+        values: np.ndarray,
+        recorded_at: np.ndarray,
+    ) -> None:
+        self.athlete_ids = athlete_ids
+        self.values = values
+        self.recorded_at = recorded_at
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[tuple[int, float, float]]
+    ) -> ResultSeries:
+        """
+        Builds the series from (athlete_id, value, recorded_at) rows, where
+        'recorded_at' is a POSIX timestamp in seconds. Numbers are copied
+        straight into the arrays, which is much faster than converting
+        datetime objects one by one.
+        """
+        return cls.from_columns(np.fromiter(rows, dtype=ROW_DTYPE))
+
+    @classmethod
+    def from_columns(cls, columns: np.ndarray) -> ResultSeries:
+        """Builds the series from a structured array of ROW_DTYPE."""
+        return cls.from_arrays(
+            columns["athlete_id"], columns["value"], columns["recorded_at"]
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        athlete_ids: np.ndarray,
+        values: np.ndarray,
+        recorded_at: np.ndarray,
+    ) -> ResultSeries:
+        """Builds the series from columns, 'recorded_at' in seconds."""
+        microseconds = np.round(recorded_at * 1_000_000).astype(np.int64)
+        return cls(
+            athlete_ids.astype(np.int64, copy=False),
+            values.astype(np.float64, copy=False),
+            microseconds.astype("datetime64[us]"),
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class AthleteStats:
+    """
+    Aggregated performance of one athlete in one event.
+
+    'progression_dates' and 'progression_values' form the progression
+    curve: the personal best as it stood after every result.
+    """
+
+    __slots__ = (
+        "athlete_id",
+        "count",
+        "personal_best",
+        "mean",
+        "rolling_average",
+        "percentiles",
+        "latest_recorded_at",
+        "progression_dates",
+        "progression_values",
+    )
+
+    def __init__(
+        self,
+        athlete_id: int,
+        count: int,
+        personal_best: float,
+        mean: float,
+        rolling_average: float,
+        percentiles: dict[float, float],
+        latest_recorded_at: np.datetime64,
+        progression_dates: np.ndarray,
+        progression_values: np.ndarray,
+    ) -> None:
+        self.athlete_id = athlete_id
+        self.count = count
+        self.personal_best = personal_best
+        self.mean = mean
+        self.rolling_average = rolling_average
+        self.percentiles = percentiles
+        self.latest_recorded_at = latest_recorded_at
+        self.progression_dates = progression_dates
+        self.progression_values = progression_values
+
+
+def compute_performance_stats(
+    series: ResultSeries,
+    lower_is_better: bool = True,
+    window: int = 5,
+    percentiles: Sequence[float] = (50.0, 90.0),
+) -> dict[int, AthleteStats]:
+    """
+    Computes the statistics of all athletes in the series at once.
+
+    Every aggregate is a vectorized operation over the whole series, the
+    athletes are told apart by their segment boundaries.
+
+    Args:
+    - series (ResultSeries): Results sorted by athlete and time.
+    - lower_is_better (bool): True for timed events, False for distances,
+                              heights and scores.
+    - window (int): Number of latest results in the rolling average.
+    - percentiles (Sequence[float]): Percentiles (0-100) of every
+                                     athlete's results to compute.
+
+    Returns:
+    - dict[int, AthleteStats]: Statistics by athlete ID.
+    """
+    size = len(series)
+    if size == 0:
+        return {}
+
+    athlete_ids = series.athlete_ids
+    values = series.values
+    positions = np.arange(size)
+
+    boundaries = np.flatnonzero(athlete_ids[1:] != athlete_ids[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [size]))
+    counts = ends - starts
+
+    best_reducer = np.minimum if lower_is_better else np.maximum
+    personal_bests = best_reducer.reduceat(values, starts)
+    means = np.add.reduceat(values, starts) / counts
+
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    window_starts = np.maximum(ends - window, starts)
+    rolling_averages = (cumulative[ends] - cumulative[window_starts]) / (
+        ends - window_starts
+    )
+
+    # Both the percentiles and the progression curve need the results
+    # ordered by value inside every segment. The global rank of a value
+    # is an integer, so 'segment * size + rank' orders the results by
+    # athlete and value with a single integer sort instead of a lexsort.
+    value_order = np.argsort(values)
+    sorted_values = values[value_order]
+    ranks = np.empty(size, dtype=np.int64)
+    ranks[value_order] = positions
+    segment_offsets = np.repeat(np.arange(len(starts)) * size, counts)
+
+    ascending = sorted_values[
+        np.sort(segment_offsets + ranks) - segment_offsets
+    ]
+    percentile_values = {}
+    for percentile in percentiles:
+        rank = starts + percentile / 100 * (counts - 1)
+        lower = np.floor(rank).astype(np.int64)
+        upper = np.minimum(lower + 1, ends - 1)
+        percentile_values[percentile] = ascending[lower] + (
+            ascending[upper] - ascending[lower]
+        ) * (rank - lower)
+
+    # A running maximum of the offset ranks never crosses a segment
+    # boundary, because the ranks of every next athlete are offset higher.
+    # For timed events the ranks are mirrored so the best result is the
+    # highest one.
+    best_ranks = size - 1 - ranks if lower_is_better else ranks
+    running_best = (
+        np.maximum.accumulate(segment_offsets + best_ranks) - segment_offsets
+    )
+    if lower_is_better:
+        running_best = size - 1 - running_best
+    progression = sorted_values[running_best]
+
+    # Only the assembly of the per-athlete objects is a Python loop, so
+    # the columns are converted to lists once instead of element by element.
+    percentile_columns = {
+        percentile: column.tolist()
+        for percentile, column in percentile_values.items()
+    }
+    stats = {}
+    for index, (
+        athlete_id,
+        start,
+        end,
+        count,
+        best,
+        mean,
+        rolling,
+    ) in enumerate(
+        zip(
+            athlete_ids[starts].tolist(),
+            starts.tolist(),
+            ends.tolist(),
+            counts.tolist(),
+            personal_bests.tolist(),
+            means.tolist(),
+            rolling_averages.tolist(),
+        )
+    ):
+        stats[athlete_id] = AthleteStats(
+            athlete_id=athlete_id,
+            count=count,
+            personal_best=best,
+            mean=mean,
+            rolling_average=rolling,
+            percentiles={
+                percentile: column[index]
+                for percentile, column in percentile_columns.items()
+            },
+            latest_recorded_at=series.recorded_at[end - 1],
+            # Copies, so a cached entry does not keep the arrays of the
+            # whole batch alive.
+            progression_dates=series.recorded_at[start:end].copy(),
+            progression_values=progression[start:end].copy(),
+        )
+    return stats
+
+
+@memory_profiler_class
+class PerformanceAnalyticsService:
+    """
+    Computes athlete statistics in batches and caches them.
+
+    A cached entry is valid while the athlete's latest result timestamp
+    and result count for the event stay the same, so after new results
+    only the affected athletes are recomputed.
+
+    Whether lower values are better is decided by the event, with the
+    same 'higher_is_better_events' as the leaderboards.
+    """
+
+    __slots__ = (
+        "_session_factory",
+        "_higher_is_better_events",
+        "_window",
+        "_percentiles",
+        "_max_cache_size",
+        "_cache",
+    )
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        higher_is_better_events: Iterable[str] = HIGHER_IS_BETTER_EVENTS,
+        window: int = 5,
+        percentiles: Sequence[float] = (50.0, 90.0),
+        max_cache_size: int = 100_000,
+    ) -> None:
+        self._session_factory = session_factory
+        self._higher_is_better_events = frozenset(higher_is_better_events)
+        self._window = window
+        self._percentiles = tuple(percentiles)
+        self._max_cache_size = max_cache_size
+        self._cache: OrderedDict[
+            CacheKey, tuple[ResultVersion, AthleteStats]
+        ] = OrderedDict()
+
+    async def get_stats(
+        self, event: str, athlete_ids: Iterable[int]
+    ) -> dict[int, AthleteStats]:
+        """
+        Returns the statistics of the given athletes in the event.
+
+        Athletes without results in the event are left out.
+        """
+        requested_ids = sorted(set(athlete_ids))
+        stats: dict[int, AthleteStats] = {}
+
+        async with self._session_factory() as session:
+            versions = await self._fetch_versions(
+                session, event, requested_ids
+            )
+
+            stale_ids = []
+            for athlete_id, version in versions.items():
+                cached = self._get_cached((event, athlete_id), version)
+                if cached is None:
+                    stale_ids.append(athlete_id)
+                else:
+                    stats[athlete_id] = cached
+
+            if stale_ids:
+                logger.info(
+                    f"Recomputing '{event}' statistics for "
+                    f"{len(stale_ids)} of {len(versions)} athletes"
+                )
+                series = await fetch_result_series(session, event, stale_ids)
+                fresh_stats = compute_performance_stats(
+                    series,
+                    lower_is_better=(
+                        event not in self._higher_is_better_events
+                    ),
+                    window=self._window,
+                    percentiles=self._percentiles,
+                )
+                for athlete_id, athlete_stats in fresh_stats.items():
+                    self._store(
+                        (event, athlete_id),
+                        versions[athlete_id],
+                        athlete_stats,
+                    )
+                stats.update(fresh_stats)
+
+        return stats
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    def _get_cached(
+        self, key: CacheKey, version: ResultVersion
+    ) -> Optional[AthleteStats]:
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        self._cache.move_to_end(key)
+        return cached[1]
+
+    def _store(
+        self, key: CacheKey, version: ResultVersion, stats: AthleteStats
+    ) -> None:
+        self._cache[key] = (version, stats)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    async def _fetch_versions(
+        session: AsyncSession, event: str, athlete_ids: list[int]
+    ) -> dict[int, ResultVersion]:
+        versions = {}
+        for batch in _batches(athlete_ids):
+            rows = await session.execute(
+                select(
+                    Result.athlete_id,
+                    func.max(Result.recorded_at),
+                    func.count(),
+                )
+                .where(Result.event == event, Result.athlete_id.in_(batch))
+                .group_by(Result.athlete_id)
+            )
+            for athlete_id, latest_recorded_at, count in rows:
+                versions[athlete_id] = (latest_recorded_at, count)
+        return versions
+
+
+async def fetch_result_series(
+    session: AsyncSession, event: str, athlete_ids: list[int]
+) -> ResultSeries:
+    """
+    Loads the results of the athletes in the event as a ResultSeries.
+
+    On Postgres every batch of athletes comes back as one row of three
+    arrays, so no per-result row objects are created. Other databases,
+    like SQLite in tests, fall back to reading the rows one by one.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return await _fetch_series_columns(session, event, athlete_ids)
+    return await _fetch_series_rows(session, event, athlete_ids)
+
+
+def build_postgresql_series_query(
+    event: str, athlete_ids: list[int]
+) -> Select:
+    """
+    Builds the Postgres query that aggregates the results of the athletes
+    into three arrays, all ordered by athlete and time.
+    """
+    order = (Result.athlete_id, Result.recorded_at, Result.id)
+    recorded_at = cast(extract("epoch", Result.recorded_at), Float)
+    return select(
+        func.array_agg(aggregate_order_by(Result.athlete_id, *order)),
+        func.array_agg(aggregate_order_by(Result.value, *order)),
+        func.array_agg(aggregate_order_by(recorded_at, *order)),
+    ).where(Result.event == event, Result.athlete_id.in_(athlete_ids))
+
+
+async def _fetch_series_columns(
+    session: AsyncSession, event: str, athlete_ids: list[int]
+) -> ResultSeries:
+    columns: tuple[list, list, list] = ([], [], [])
+    for batch in _batches(athlete_ids):
+        result = await session.execute(
+            build_postgresql_series_query(event, batch)
+        )
+        batch_columns = result.one()
+        # 'array_agg' returns NULL when no rows match.
+        if batch_columns[0] is None:
+            continue
+        for column, batch_column, dtype in zip(
+            columns, batch_columns, (np.int64, np.float64, np.float64)
+        ):
+            column.append(np.asarray(batch_column, dtype=dtype))
+
+    athlete_id_batches, value_batches, recorded_at_batches = columns
+    if not athlete_id_batches:
+        return ResultSeries.from_columns(np.empty(0, dtype=ROW_DTYPE))
+    return ResultSeries.from_arrays(
+        np.concatenate(athlete_id_batches),
+        np.concatenate(value_batches),
+        np.concatenate(recorded_at_batches),
+    )
+
+
+async def _fetch_series_rows(
+    session: AsyncSession, event: str, athlete_ids: list[int]
+) -> ResultSeries:
+    recorded_at = cast(extract("epoch", Result.recorded_at), Float)
+    batch_columns = [np.empty(0, dtype=ROW_DTYPE)]
+    for batch in _batches(athlete_ids):
+        result = await session.execute(
+            select(Result.athlete_id, Result.value, recorded_at)
+            .where(Result.event == event, Result.athlete_id.in_(batch))
+            .order_by(Result.athlete_id, Result.recorded_at, Result.id)
+        )
+        batch_columns.append(np.fromiter(map(tuple, result), dtype=ROW_DTYPE))
+    return ResultSeries.from_columns(np.concatenate(batch_columns))
+
+
+def _batches(items: list[int]) -> Iterable[list[int]]:
+    for start in range(0, len(items), QUERY_BATCH_SIZE):
+        yield items[start : start + QUERY_BATCH_SIZE]
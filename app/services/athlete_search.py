@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+from sqlalchemy import (
+    ColumnClause,
+    Select,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.athlete import Athlete
+from app.utils.decorators import memory_profiler_class
+
+logger = logging.getLogger(__name__)
+
+# Same as the default 'pg_trgm.word_similarity_threshold', used by the
+# '<%' operator.
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+# Must match the expressions of the indexes created in the
+# 'add_athlete_search_indexes' migration, otherwise Postgres can not use
+# them.
+FULL_NAME = Athlete.first_name + literal_column("' '") + Athlete.last_name
+SEARCH_CONFIG: ColumnClause[str] = literal_column("'simple'")
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Lower-cases the text and strips accents for autocomplete:
+    'Ólafur' -> 'olafur'. Search does not strip accents, like 'pg_trgm'.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+
+
+def get_words(text: str) -> list[str]:
+    """Splits the lower-cased text into words, keeping accents."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def get_trigram_sequence(text: str) -> list[str]:
+    """
+    Splits the text into trigrams the way 'pg_trgm' does, in order: every
+    word is padded with two spaces in front and one space behind.
+    """
+    trigrams: list[str] = []
+    for word in get_words(text):
+        padded = f"  {word} "
+        trigrams.extend(
+            padded[index : index + 3] for index in range(len(padded) - 2)
+        )
+    return trigrams
+
+
+def get_trigrams(text: str) -> set[str]:
+    return set(get_trigram_sequence(text))
+
+
+def trigram_similarity(first: str, second: str) -> float:
+    """Python equivalent of the 'pg_trgm' 'similarity' function."""
+    first_trigrams = get_trigrams(first)
+    second_trigrams = get_trigrams(second)
+    if not first_trigrams or not second_trigrams:
+        return 0.0
+    return len(first_trigrams & second_trigrams) / len(
+        first_trigrams | second_trigrams
+    )
+
+
+def word_similarity(first: str, second: str) -> float:
+    """
+    Python equivalent of the 'pg_trgm' 'word_similarity' function: the
+    greatest similarity between the trigrams of 'first' and any
+    continuous extent of the ordered trigrams of 'second'.
+    """
+    first_trigrams = get_trigrams(first)
+    sequence = get_trigram_sequence(second)
+    best = 0.0
+    for start, first_of_extent in enumerate(sequence):
+        # Starting with a trigram 'first' lacks only lowers the similarity.
+        if first_of_extent not in first_trigrams:
+            continue
+        extent: set[str] = set()
+        shared = 0
+        for trigram in sequence[start:]:
+            if trigram in extent:
+                continue
+            extent.add(trigram)
+            if trigram in first_trigrams:
+                shared += 1
+                best = max(
+                    best,
+                    shared / (len(first_trigrams) + len(extent) - shared),
+                )
+    return best
+
+
+class SearchHit:
+    __slots__ = ("athlete_id", "first_name", "last_name", "score")
+
+    def __init__(
+        self, athlete_id: int, first_name: str, last_name: str, score: float
+    ) -> None:
+        self.athlete_id = athlete_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.score = score
+
+
+class PrefixIndex:
+    """
+    In-memory autocomplete index over athlete names.
+
+    Every name word and the full name are kept in one sorted list, so a
+    prefix lookup is a binary search followed by a scan of the matches.
+    A match scores the share of the matched name word or full name that
+    the prefix covers: exact matches score 1 and rank first.
+    """
+
+    __slots__ = ("_keys", "_names")
+
+    def __init__(self, athletes: Iterable[tuple[int, str, str]] = ()) -> None:
+        self._names = {
+            athlete_id: (first_name, last_name)
+            for athlete_id, first_name, last_name in athletes
+        }
+        self._keys = sorted(
+            (key, athlete_id)
+            for athlete_id, names in self._names.items()
+            for key in self._get_keys(*names)
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, athlete_id: int, first_name: str, last_name: str) -> None:
+        """Adds the athlete, replacing the names indexed before."""
+        self.remove(athlete_id)
+        for key in self._get_keys(first_name, last_name):
+            insort(self._keys, (key, athlete_id))
+        self._names[athlete_id] = (first_name, last_name)
+
+    def remove(self, athlete_id: int) -> None:
+        names = self._names.pop(athlete_id, None)
+        if names is None:
+            return
+        for key in self._get_keys(*names):
+            del self._keys[bisect_left(self._keys, (key, athlete_id))]
+
+    def search(self, prefix: str, limit: int = 10) -> list[SearchHit]:
+        normalized = normalize(prefix).strip()
+        if not normalized:
+            return []
+
+        scores: dict[int, float] = {}
+        index = bisect_left(self._keys, (normalized,))
+        while index < len(self._keys):
+            key, athlete_id = self._keys[index]
+            if not key.startswith(normalized):
+                break
+            score = len(normalized) / len(key)
+            if score > scores.get(athlete_id, 0.0):
+                scores[athlete_id] = score
+            index += 1
+
+        best = heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+        return [
+            SearchHit(athlete_id, *self._names[athlete_id], score)
+            for athlete_id, score in best
+        ]
+
+    @staticmethod
+    def _get_keys(first_name: str, last_name: str) -> set[str]:
+        full_name = normalize(f"{first_name} {last_name}")
+        return {full_name, *WORD_PATTERN.findall(full_name)}
+
+
+@memory_profiler_class
+class AthleteSearchService:
+    """
+    Fuzzy athlete name search and autocomplete.
+
+    On Postgres the search uses the trigram and full-text indexes of the
+    'athletes' table. Other databases, like SQLite in tests, fall back to
+    matching and ranking every athlete in Python with ports of the same
+    word similarity and whole-word match.
+
+    Autocomplete is served from an in-memory PrefixIndex. It is loaded on
+    first use, kept up to date through 'index_athletes' and
+    'remove_athlete', and reloaded after 'max_index_age' seconds to pick
+    up changes made by other processes. Updates made while the index is
+    being loaded are replayed onto the new index before it is used.
+    """
+
+    __slots__ = (
+        "_session_factory",
+        "_max_index_age",
+        "_prefix_index",
+        "_loaded_at",
+        "_load_lock",
+        "_pending_updates",
+    )
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_index_age: float = 300.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self._max_index_age = max_index_age
+        self._prefix_index: Optional[PrefixIndex] = None
+        self._loaded_at = 0.0
+        self._load_lock = asyncio.Lock()
+        # Athlete IDs with their new names, or None if removed. Only
+        # recorded while the index is being loaded.
+        self._pending_updates: Optional[
+            list[tuple[int, Optional[tuple[str, str]]]]
+        ] = None
+
+    async def search(self, query: str, limit: int = 20) -> list[SearchHit]:
+        """
+        Returns the athletes whose names are similar to the query, best
+        matches first. Tolerates typos and word order.
+        """
+        if not query.strip():
+            return []
+
+        async with self._session_factory() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                rows = await session.execute(
+                    build_postgresql_search(query, limit)
+                )
+                return [SearchHit(*row) for row in rows]
+
+            rows = await session.execute(
+                select(Athlete.id, Athlete.first_name, Athlete.last_name)
+            )
+            return self._rank_in_python(query, rows.tuples(), limit)
+
+    async def autocomplete(
+        self, prefix: str, limit: int = 10
+    ) -> list[SearchHit]:
+        prefix_index = await self._get_prefix_index()
+        return prefix_index.search(prefix, limit=limit)
+
+    def index_athletes(self, athletes: Iterable[Athlete]) -> None:
+        """Adds new or renamed athletes to a loaded autocomplete index."""
+        for athlete in athletes:
+            self._update_index(
+                athlete.id, (athlete.first_name, athlete.last_name)
+            )
+
+    def remove_athlete(self, athlete_id: int) -> None:
+        self._update_index(athlete_id, None)
+
+    def _update_index(
+        self, athlete_id: int, names: Optional[tuple[str, str]]
+    ) -> None:
+        if self._pending_updates is not None:
+            self._pending_updates.append((athlete_id, names))
+        if self._prefix_index is not None:
+            self._apply_update(self._prefix_index, athlete_id, names)
+
+    @staticmethod
+    def _apply_update(
+        prefix_index: PrefixIndex,
+        athlete_id: int,
+        names: Optional[tuple[str, str]],
+    ) -> None:
+        if names is None:
+            prefix_index.remove(athlete_id)
+        else:
+            prefix_index.add(athlete_id, *names)
+
+    def _get_fresh_index(self) -> Optional[PrefixIndex]:
+        if time.monotonic() - self._loaded_at < self._max_index_age:
+            return self._prefix_index
+        return None
+
+    async def _get_prefix_index(self) -> PrefixIndex:
+        fresh_index = self._get_fresh_index()
+        if fresh_index is not None:
+            return fresh_index
+
+        async with self._load_lock:
+            # Loaded by a concurrent call while waiting for the lock.
+            fresh_index = self._get_fresh_index()
+            if fresh_index is not None:
+                return fresh_index
+
+            self._pending_updates = []
+            try:
+                async with self._session_factory() as session:
+                    rows = await session.execute(
+                        select(
+                            Athlete.id, Athlete.first_name, Athlete.last_name
+                        )
+                    )
+                    prefix_index = PrefixIndex(rows.tuples())
+
+                # The snapshot may predate updates made during the load.
+                for athlete_id, names in self._pending_updates:
+                    self._apply_update(prefix_index, athlete_id, names)
+            finally:
+                self._pending_updates = None
+
+            logger.info(
+                f"Loaded autocomplete index with {len(prefix_index)} athletes"
+            )
+            self._prefix_index = prefix_index
+            self._loaded_at = time.monotonic()
+            return prefix_index
+
+    @staticmethod
+    def _rank_in_python(
+        query: str, rows: Iterable[tuple[int, str, str]], limit: int
+    ) -> list[SearchHit]:
+        """Matches and ranks the rows like 'build_postgresql_search'."""
+        query_words = set(get_words(query))
+        ranked = []
+        for athlete_id, first_name, last_name in rows:
+            full_name = f"{first_name} {last_name}"
+            score = word_similarity(query, full_name)
+            if score >= WORD_SIMILARITY_THRESHOLD or (
+                query_words and query_words <= set(get_words(full_name))
+            ):
+                ranked.append(
+                    (
+                        -score,
+                        -trigram_similarity(query, full_name),
+                        athlete_id,
+                        SearchHit(athlete_id, first_name, last_name, score),
+                    )
+                )
+
+        ranked.sort(key=lambda row: row[:3])
+        return [hit for *_, hit in ranked[:limit]]
+
+
+def build_postgresql_search(query: str, limit: int) -> Select:
+    """
+    Builds the Postgres search query. Rows match by trigram word
+    similarity (typos) or by full-text search (whole words in any order)
+    and are ranked by word similarity.
+    """
+    search_vector = func.to_tsvector(SEARCH_CONFIG, FULL_NAME)
+    search_query = func.plainto_tsquery(SEARCH_CONFIG, query)
+    score = func.word_similarity(query, FULL_NAME)
+
+    return (
+        select(
+            Athlete.id,
+            Athlete.first_name,
+            Athlete.last_name,
+            score.label("score"),
+        )
+        .where(
+            or_(
+                # Parenthesized, '<%' and '||' have the same precedence.
+                literal(query).op("<%")(FULL_NAME.self_group()),
+                search_vector.op("@@")(search_query),
+            )
+        )
+        .order_by(
+            score.desc(),
+            func.similarity(query, FULL_NAME).desc(),
+            Athlete.id,
+        )
+        .limit(limit)
+    )
@@ -0,0 +1,16 @@
+# Events ranked by the highest value: distances, heights and points. All
+# other events are timed and ranked by the lowest value.
+HIGHER_IS_BETTER_EVENTS = frozenset(
+    {
+        "high_jump",
+        "pole_vault",
+        "long_jump",
+        "triple_jump",
+        "shot_put",
+        "discus_throw",
+        "hammer_throw",
+        "javelin_throw",
+        "heptathlon",
+        "decathlon",
+    }
+)
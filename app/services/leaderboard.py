@@ -0,0 +1,507 @@
+from __future__ import annotations
+
+import logging
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    cast,
+    delete,
+    extract,
+    func,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.event import listen
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.athlete import Athlete
+from app.models.leaderboard_entry import LeaderboardEntry
+from app.models.result import Result
+from app.services.events import HIGHER_IS_BETTER_EVENTS
+from app.utils.decorators import memory_profiler_class
+
+logger = logging.getLogger(__name__)
+
+ALL_AGE_GROUPS = "ALL"
+
+# Upper age limits (inclusive) of the age groups, by age at the end of
+# the season. Older athletes are in the last group.
+AGE_GROUP_LIMITS = (
+    (17, "U18"),
+    (19, "U20"),
+    (22, "U23"),
+    (34, "SENIOR"),
+)
+OLDEST_AGE_GROUP = "MASTERS"
+
+# Keeps the number of bound parameters of a single upsert below the
+# limits of asyncpg and SQLite.
+UPSERT_BATCH_SIZE = 1000
+
+BoardKey = tuple[str, int, str]
+EntryKey = tuple[str, int, str, int]
+# The results of one athlete in one event and season, in all age groups.
+AthleteSeasonKey = tuple[str, int, int]
+
+
+def get_age_group(birth_date: Optional[date], season: int) -> Optional[str]:
+    if birth_date is None:
+        return None
+
+    age = season - birth_date.year
+    for age_limit, age_group in AGE_GROUP_LIMITS:
+        if age <= age_limit:
+            return age_group
+    return OLDEST_AGE_GROUP
+
+
+def get_entry_keys(
+    event: str, season: int, athlete_id: int, birth_date: Optional[date]
+) -> list[EntryKey]:
+    """
+    Returns the leaderboard entries a result counts for: the one for all
+    ages and, if the birth date is known, the one for the age group.
+    """
+    entry_keys = [(event, season, ALL_AGE_GROUPS, athlete_id)]
+    age_group = get_age_group(birth_date, season)
+    if age_group is not None:
+        entry_keys.append((event, season, age_group, athlete_id))
+    return entry_keys
+
+
+class LeaderboardRow:
+    __slots__ = ("rank", "athlete_id", "value")
+
+    def __init__(self, rank: int, athlete_id: int, value: float) -> None:
+        self.rank = rank
+        self.athlete_id = athlete_id
+        self.value = value
+
+
+class SortedLeaderboard:
+    """
+    In-memory ranking of one leaderboard, kept sorted by score.
+
+    Rank lookups and page starts are binary searches. Athletes with equal
+    scores share a rank and the next rank is skipped, like SQL 'RANK()'.
+    """
+
+    __slots__ = ("_entries", "_scores")
+
+    def __init__(self, entries: Iterable[tuple[float, int, float]] = ()):
+        self._entries = sorted(entries)
+        self._scores = {
+            athlete_id: score for score, athlete_id, _ in self._entries
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, athlete_id: int, score: float, value: float) -> bool:
+        """
+        Puts the result on the leaderboard if it is the athlete's first
+        one or improves on the current one.
+
+        Returns:
+        - bool: True if the leaderboard changed.
+        """
+        current_score = self._scores.get(athlete_id)
+        if current_score is not None:
+            if current_score <= score:
+                return False
+            index = bisect_left(self._entries, (current_score, athlete_id))
+            del self._entries[index]
+
+        insort(self._entries, (score, athlete_id, value))
+        self._scores[athlete_id] = score
+        return True
+
+    def remove(self, athlete_id: int) -> None:
+        score = self._scores.pop(athlete_id, None)
+        if score is not None:
+            del self._entries[bisect_left(self._entries, (score, athlete_id))]
+
+    def get_rank(self, athlete_id: int) -> Optional[LeaderboardRow]:
+        score = self._scores.get(athlete_id)
+        if score is None:
+            return None
+
+        index = bisect_left(self._entries, (score, athlete_id))
+        return self._row(index)
+
+    def get_top(self, limit: int, offset: int = 0) -> list[LeaderboardRow]:
+        return [
+            self._row(index)
+            for index in range(offset, min(offset + limit, len(self)))
+        ]
+
+    def _row(self, index: int) -> LeaderboardRow:
+        score, athlete_id, value = self._entries[index]
+        rank = bisect_left(self._entries, (score,)) + 1
+        return LeaderboardRow(rank=rank, athlete_id=athlete_id, value=value)
+
+
+@memory_profiler_class
+class LeaderboardService:
+    """
+    Precomputed leaderboards by event, season and age group.
+
+    The best result of every athlete on every leaderboard is kept in the
+    'leaderboard_entries' table and updated with an upsert whenever new
+    results are added, so rankings never need a full recompute.
+
+    Leaderboards that are read are also kept in memory as
+    SortedLeaderboard objects. They are updated together with the table,
+    and reloaded from it after 'max_board_age' seconds to pick up
+    results added by other processes. At most 'max_boards' of them are
+    kept, the least recently read ones are evicted first.
+
+    The service works in the caller's transaction: it only flushes, the
+    caller commits. Loaded leaderboards are updated when that transaction
+    commits and left alone if it is rolled back.
+
+    Scores are stored so that lower is always better, which makes the
+    ranking direction of an event part of the stored data. It is decided
+    in one place, by 'higher_is_better_events', and must not change once
+    the event has entries.
+    """
+
+    __slots__ = (
+        "_session_factory",
+        "_higher_is_better_events",
+        "_max_board_age",
+        "_max_boards",
+        "_boards",
+    )
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        higher_is_better_events: Iterable[str] = HIGHER_IS_BETTER_EVENTS,
+        max_board_age: float = 60.0,
+        max_boards: int = 1000,
+    ) -> None:
+        self._session_factory = session_factory
+        self._higher_is_better_events = frozenset(higher_is_better_events)
+        self._max_board_age = max_board_age
+        self._max_boards = max_boards
+        self._boards: OrderedDict[
+            BoardKey, tuple[float, SortedLeaderboard]
+        ] = OrderedDict()
+
+    async def add_results(
+        self, session: AsyncSession, results: Sequence[Result]
+    ) -> None:
+        """
+        Adds the results to the session and updates the leaderboards they
+        belong to. Nothing is committed.
+
+        Args:
+        - session (AsyncSession): The caller's session.
+        - results (Sequence[Result]): New results, of any events.
+        """
+        for result in results:
+            if result.recorded_at is None:
+                result.recorded_at = datetime.now()
+
+        session.add_all(results)
+        birth_dates = await self._fetch_birth_dates(
+            session, {result.athlete_id for result in results}
+        )
+
+        best_entries: dict[EntryKey, tuple[float, float]] = {}
+        for result in results:
+            score = (
+                result.value
+                if self._is_lower_better(result.event)
+                else -result.value
+            )
+            for key in get_entry_keys(
+                result.event,
+                result.recorded_at.year,
+                result.athlete_id,
+                birth_dates.get(result.athlete_id),
+            ):
+                if key not in best_entries or score < best_entries[key][0]:
+                    best_entries[key] = (score, result.value)
+
+        await self._upsert_entries(session, best_entries)
+        self._after_commit(session, self._apply_entries, best_entries)
+
+    async def remove_results(
+        self, session: AsyncSession, results: Sequence[Result]
+    ) -> None:
+        """
+        Deletes the results, e.g. after a disqualification, and recomputes
+        the leaderboard entries they counted for. Nothing is committed.
+        """
+        keys = {
+            (result.event, result.recorded_at.year, result.athlete_id)
+            for result in results
+        }
+        for result in results:
+            await session.delete(result)
+        await self.recompute_entries(session, keys)
+
+    async def recompute_entries(
+        self, session: AsyncSession, keys: Iterable[AthleteSeasonKey]
+    ) -> None:
+        """
+        Recomputes the entries of athletes from the results table. Needed
+        after results were changed or deleted, because entries otherwise
+        only ever improve. Nothing is committed.
+
+        Args:
+        - session (AsyncSession): The caller's session.
+        - keys (Iterable[tuple[str, int, int]]): Event, season and athlete
+                                                 ID of every changed
+                                                 result, before and after
+                                                 the change.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+
+        await session.flush()
+        await session.execute(
+            delete(LeaderboardEntry).where(
+                tuple_(
+                    LeaderboardEntry.event,
+                    LeaderboardEntry.season,
+                    LeaderboardEntry.athlete_id,
+                ).in_(sorted(keys))
+            )
+        )
+
+        best_entries: dict[EntryKey, tuple[float, float]] = {}
+        season = cast(extract("year", Result.recorded_at), Integer)
+        for event in {event for event, _, _ in keys}:
+            event_keys = [key for key in keys if key[0] == event]
+            entries = await self._compute_best_entries(
+                session,
+                event,
+                Result.athlete_id.in_({key[2] for key in event_keys}),
+                season.in_({key[1] for key in event_keys}),
+            )
+            best_entries.update(
+                (entry_key, entry)
+                for entry_key, entry in entries.items()
+                if (entry_key[0], entry_key[1], entry_key[3]) in keys
+            )
+
+        await self._upsert_entries(session, best_entries)
+        self._after_commit(session, self._replace_entries, keys, best_entries)
+
+    async def get_top(
+        self,
+        event: str,
+        season: int,
+        age_group: str = ALL_AGE_GROUPS,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[LeaderboardRow]:
+        board = await self._get_board((event, season, age_group))
+        return board.get_top(limit=limit, offset=offset)
+
+    async def get_rank(
+        self,
+        event: str,
+        season: int,
+        athlete_id: int,
+        age_group: str = ALL_AGE_GROUPS,
+    ) -> Optional[LeaderboardRow]:
+        board = await self._get_board((event, season, age_group))
+        return board.get_rank(athlete_id)
+
+    async def rebuild(self, session: AsyncSession, event: str) -> None:
+        """
+        Recomputes all leaderboards of the event from the results table.
+        Only needed to fill the table for existing results. Nothing is
+        committed.
+        """
+        await session.flush()
+        await session.execute(
+            delete(LeaderboardEntry).where(LeaderboardEntry.event == event)
+        )
+        best_entries = await self._compute_best_entries(session, event)
+        await self._upsert_entries(session, best_entries)
+
+        logger.info(
+            f"Rebuilt '{event}' leaderboards with "
+            f"{len(best_entries)} entries"
+        )
+        self._after_commit(session, self._forget_boards, event)
+
+    def _is_lower_better(self, event: str) -> bool:
+        return event not in self._higher_is_better_events
+
+    async def _compute_best_entries(
+        self,
+        session: AsyncSession,
+        event: str,
+        *conditions: ColumnElement[bool],
+    ) -> dict[EntryKey, tuple[float, float]]:
+        lower_is_better = self._is_lower_better(event)
+        score = Result.value if lower_is_better else -Result.value
+        season = cast(extract("year", Result.recorded_at), Integer)
+
+        rows = await session.execute(
+            select(
+                Result.athlete_id,
+                season,
+                func.min(score),
+                Athlete.birth_date,
+            )
+            .join(Athlete, Athlete.id == Result.athlete_id)
+            .where(Result.event == event, *conditions)
+            .group_by(Result.athlete_id, season, Athlete.birth_date)
+        )
+
+        best_entries = {}
+        for athlete_id, result_season, best_score, birth_date in rows:
+            value = best_score if lower_is_better else -best_score
+            for key in get_entry_keys(
+                event, result_season, athlete_id, birth_date
+            ):
+                best_entries[key] = (best_score, value)
+        return best_entries
+
+    @staticmethod
+    def _after_commit(
+        session: AsyncSession, callback: Callable[..., None], *args: Any
+    ) -> None:
+        """
+        Runs the callback when the session's transaction commits. It is
+        dropped if the transaction is rolled back instead.
+        """
+        pending = [callback]
+
+        def on_commit(_: Any) -> None:
+            if pending:
+                pending.pop()(*args)
+
+        def on_rollback(_: Any) -> None:
+            pending.clear()
+
+        listen(session.sync_session, "after_commit", on_commit, once=True)
+        listen(session.sync_session, "after_rollback", on_rollback, once=True)
+
+    def _apply_entries(
+        self, best_entries: dict[EntryKey, tuple[float, float]]
+    ) -> None:
+        for entry_key, (score, value) in best_entries.items():
+            loaded = self._boards.get(entry_key[:3])
+            if loaded is not None:
+                loaded[1].update(entry_key[3], score, value)
+
+    def _replace_entries(
+        self,
+        keys: set[AthleteSeasonKey],
+        best_entries: dict[EntryKey, tuple[float, float]],
+    ) -> None:
+        for (event, season, _), (_, board) in self._boards.items():
+            for key_event, key_season, athlete_id in keys:
+                if (key_event, key_season) == (event, season):
+                    board.remove(athlete_id)
+        self._apply_entries(best_entries)
+
+    def _forget_boards(self, event: str) -> None:
+        for board_key in [key for key in self._boards if key[0] == event]:
+            del self._boards[board_key]
+
+    async def _get_board(self, key: BoardKey) -> SortedLeaderboard:
+        loaded = self._boards.get(key)
+        if loaded is not None:
+            loaded_at, board = loaded
+            if time.monotonic() - loaded_at < self._max_board_age:
+                self._boards.move_to_end(key)
+                return board
+
+        event, season, age_group = key
+        async with self._session_factory() as session:
+            rows = await session.execute(
+                select(
+                    LeaderboardEntry.score,
+                    LeaderboardEntry.athlete_id,
+                    LeaderboardEntry.value,
+                ).where(
+                    LeaderboardEntry.event == event,
+                    LeaderboardEntry.season == season,
+                    LeaderboardEntry.age_group == age_group,
+                )
+            )
+            board = SortedLeaderboard(rows.tuples())
+
+        self._boards[key] = (time.monotonic(), board)
+        self._boards.move_to_end(key)
+        while len(self._boards) > self._max_boards:
+            self._boards.popitem(last=False)
+        return board
+
+    @staticmethod
+    async def _fetch_birth_dates(
+        session: AsyncSession, athlete_ids: set[int]
+    ) -> dict[int, Optional[date]]:
+        rows = await session.execute(
+            select(Athlete.id, Athlete.birth_date).where(
+                Athlete.id.in_(athlete_ids)
+            )
+        )
+        return {athlete_id: birth_date for athlete_id, birth_date in rows}
+
+    @staticmethod
+    async def _upsert_entries(
+        session: AsyncSession,
+        best_entries: dict[EntryKey, tuple[float, float]],
+    ) -> None:
+        if not best_entries:
+            return
+
+        insert = (
+            sqlite_insert
+            if session.get_bind().dialect.name == "sqlite"
+            else postgresql_insert
+        )
+        # Rows are locked in primary key order, so concurrent upserts
+        # can not deadlock by locking the same rows in opposite orders.
+        entries = [
+            {
+                "event": event,
+                "season": season,
+                "age_group": age_group,
+                "athlete_id": athlete_id,
+                "score": score,
+                "value": value,
+            }
+            for (event, season, age_group, athlete_id), (
+                score,
+                value,
+            ) in sorted(best_entries.items())
+        ]
+        for start in range(0, len(entries), UPSERT_BATCH_SIZE):
+            statement = insert(LeaderboardEntry).values(
+                entries[start : start + UPSERT_BATCH_SIZE]
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[
+                        LeaderboardEntry.event,
+                        LeaderboardEntry.season,
+                        LeaderboardEntry.age_group,
+                        LeaderboardEntry.athlete_id,
+                    ],
+                    set_={
+                        "score": statement.excluded.score,
+                        "value": statement.excluded.value,
+                    },
+                    where=statement.excluded.score < LeaderboardEntry.score,
+                )
+            )
@@ -0,0 +1,580 @@
+import asyncio
+import logging
+import mmap
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Optional
+
+import google.auth
+import requests
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import Credentials
+from google.auth.exceptions import GoogleAuthError
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud.storage import Blob, Bucket, Client
+
+from app.core.exceptions import (
+    ErrorWithGoogleCloudAuthentication,
+    InvalidByteRange,
+    StorageError,
+    StorageObjectNotFound,
+    TransientStorageError,
+)
+from app.utils.decorators import (
+    async_retry_with_backoff,
+    memory_profiler_class,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cloud Storage requires every resumable chunk except the last one to be
+# a multiple of 256 KiB.
+CHUNK_SIZE = 8 * 256 * 1024
+
+RANGE_HEADER_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Statuses of a resumable upload request that are worth retrying.
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def parse_range_header(header: str, size: int) -> tuple[int, int]:
+    """
+    Parses a single HTTP 'Range' header into inclusive byte offsets.
+
+    Args:
+    - header (str): Header value, e.g. 'bytes=0-1023', 'bytes=1024-' or
+                    'bytes=-500'.
+    - size (int): Size of the object in bytes.
+
+    Returns:
+    - tuple[int, int]: The first and the last byte of the range.
+    """
+    match = RANGE_HEADER_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        error_message = f"Unsupported Range header '{header}'"
+        logger.warning(error_message)
+        raise InvalidByteRange(error_message)
+
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        error_message = (
+            f"Range '{header}' is not satisfiable for object "
+            f"of size {size}"
+        )
+        logger.warning(error_message)
+        raise InvalidByteRange(error_message)
+
+    return start, end
+
+
+async def rechunk(
+    chunks: AsyncIterable[bytes], chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Regroups an incoming byte stream into chunks of exactly 'chunk_size'
+    bytes, only the last chunk may be shorter. At most one chunk is kept
+    in memory.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class StorageBase(ABC):
+    """
+    Abstract base class for media storage.
+
+    Uploads and downloads are streamed chunk by chunk, so whole files are
+    never held in memory.
+    """
+
+    @abstractmethod
+    async def upload(
+        self,
+        path: str,
+        chunks: AsyncIterable[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        """
+        Streams the object into storage.
+
+        Args:
+        - path (str): Object path inside the storage.
+        - chunks (AsyncIterable[bytes]): Object content, e.g. a request
+                                         body stream.
+        - content_type (str): MIME type of the object.
+
+        Returns:
+        - int: Number of bytes written.
+        """
+        pass
+
+    @abstractmethod
+    async def get_size(self, path: str) -> int:
+        pass
+
+    @abstractmethod
+    def download(
+        self, path: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Streams the object, or a part of it, from storage.
+
+        Args:
+        - path (str): Object path inside the storage.
+        - start (int): First byte to return.
+        - end (int): Last byte to return (inclusive). Defaults to the end
+                     of the object.
+
+        Returns:
+        - AsyncIterator[bytes]: Object content in chunks.
+        """
+        pass
+
+    @abstractmethod
+    async def get_signed_url(
+        self, path: str, expiration: timedelta
+    ) -> Optional[str]:
+        """
+        Returns a temporary URL the client can download the object from
+        directly, or None if the backend can not issue one and the object
+        has to be streamed with 'download'.
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, path: str) -> None:
+        pass
+
+
+@memory_profiler_class
+class GoogleCloudStorage(StorageBase):
+    """
+    Storage backed by a Google Cloud Storage bucket.
+
+    Uploads go through a resumable upload session, one PUT per chunk.
+    Whatever part of a chunk the server did not persist is resent, and
+    failed requests are retried from the offset the server reports.
+    A download is a single ranged GET of one object generation, streamed
+    in chunks of 'chunk_size' bytes.
+
+    Signed URLs are signed through the IAM 'signBlob' API, so they work
+    with the token-only default credentials of Cloud Run and GCE, which
+    have no private key.
+    """
+
+    __slots__ = (
+        "_bucket",
+        "_credentials",
+        "_session",
+        "_chunk_size",
+        "_retry",
+    )
+
+    def __init__(
+        self,
+        bucket: Bucket,
+        credentials: Credentials,
+        session: Optional[requests.Session] = None,
+        chunk_size: int = CHUNK_SIZE,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+    ) -> None:
+        self._bucket = bucket
+        self._credentials = credentials
+        self._session = session or AuthorizedSession(credentials)
+        self._chunk_size = chunk_size
+        self._retry = async_retry_with_backoff(
+            exceptions=(TransientStorageError,),
+            max_attempts=max_attempts,
+            base_delay=base_delay,
+        )
+
+    async def upload(
+        self,
+        path: str,
+        chunks: AsyncIterable[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        blob = self._bucket.blob(path)
+        session_url = await asyncio.to_thread(
+            blob.create_resumable_upload_session, content_type=content_type
+        )
+
+        offset = 0
+        pending: Optional[bytes] = None
+        async for chunk in rechunk(chunks, self._chunk_size):
+            if pending is not None:
+                await self._send_chunk(session_url, pending, offset, None)
+                offset += len(pending)
+            pending = chunk
+
+        # The last chunk is sent together with the total size, which
+        # finalizes the upload. It may be empty if nothing was received.
+        pending = pending or b""
+        total = offset + len(pending)
+        await self._send_chunk(session_url, pending, offset, total)
+        return total
+
+    async def _send_chunk(
+        self,
+        session_url: str,
+        chunk: bytes,
+        offset: int,
+        total: Optional[int],
+    ) -> None:
+        """
+        Sends the chunk until the server has persisted all of it, or has
+        finalized the upload if 'total' is given.
+        """
+        end = offset + len(chunk)
+        position = offset
+        interrupted = False
+
+        async def send_rest() -> Optional[int]:
+            nonlocal position, interrupted
+            if interrupted:
+                # The failed request may have been persisted in part, so
+                # the server is asked where to continue from.
+                persisted = await self._put(session_url, b"", offset, total)
+                if persisted is None:
+                    return None
+                position = self._check_persisted(persisted, offset, end)
+
+            interrupted = True
+            persisted = await self._put(
+                session_url, chunk[position - offset :], position, total
+            )
+            interrupted = False
+            return persisted
+
+        while True:
+            try:
+                persisted = await self._retry(send_rest)()
+            except TransientStorageError as exc:
+                logger.error(exc.message)
+                raise
+            if persisted is None or (total is None and persisted == end):
+                return
+            if persisted <= position:
+                error_message = (
+                    f"Resumable upload made no progress at offset {position}"
+                )
+                logger.error(error_message)
+                raise StorageError(error_message)
+            position = self._check_persisted(persisted, offset, end)
+
+    async def _put(
+        self,
+        session_url: str,
+        data: bytes,
+        position: int,
+        total: Optional[int],
+    ) -> Optional[int]:
+        """
+        Sends one request of the resumable upload. Without data it only
+        asks for the upload status.
+
+        Returns:
+        - Optional[int]: Number of bytes persisted by the server, or None
+                         if the upload is complete.
+        """
+        byte_range = f"{position}-{position + len(data) - 1}" if data else "*"
+        object_size = "*" if total is None else str(total)
+        headers = {"Content-Range": f"bytes {byte_range}/{object_size}"}
+
+        try:
+            response = await asyncio.to_thread(
+                self._session.put, session_url, data=data, headers=headers
+            )
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            raise TransientStorageError(
+                f"Resumable upload request failed at offset {position}. "
+                f"Trigger exception: {exc.__class__.__name__}.\n"
+                f"Message: {exc}"
+            )
+
+        if response.status_code == 308:
+            return self._get_persisted_size(response)
+        if response.status_code in (200, 201):
+            return None
+
+        error_message = (
+            f"Resumable upload failed at offset {position}. "
+            f"Status: {response.status_code}.\n"
+            f"Message: {response.text}"
+        )
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            raise TransientStorageError(error_message)
+        logger.error(error_message)
+        raise StorageError(error_message)
+
+    @staticmethod
+    def _get_persisted_size(response: requests.Response) -> int:
+        # A 308 response without a 'Range' header means nothing has been
+        # persisted yet, otherwise the header is 'bytes=0-{last byte}'.
+        persisted_range = response.headers.get("Range")
+        if not persisted_range:
+            return 0
+        return int(persisted_range.rpartition("-")[2]) + 1
+
+    @staticmethod
+    def _check_persisted(persisted: int, offset: int, end: int) -> int:
+        # Only the current chunk is kept in memory, earlier bytes can not
+        # be sent again.
+        if not offset <= persisted <= end:
+            error_message = (
+                f"Resumable upload persisted {persisted} bytes, expected "
+                f"between {offset} and {end}"
+            )
+            logger.error(error_message)
+            raise StorageError(error_message)
+        return persisted
+
+    async def get_size(self, path: str) -> int:
+        blob = await self._get_blob(path)
+        return blob.size
+
+    async def download(
+        self, path: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        # The media link of the blob loaded with its metadata contains its
+        # generation, so the download returns that version of the object
+        # even if it is overwritten in the meantime.
+        blob = await self._get_blob(path)
+        end = blob.size - 1 if end is None else min(end, blob.size - 1)
+        if start > end:
+            return
+
+        response = await asyncio.to_thread(
+            self._session.get,
+            blob.media_link,
+            headers={"Range": f"bytes={start}-{end}"},
+            stream=True,
+        )
+        try:
+            if response.status_code == 404:
+                raise self._not_found(path)
+            if response.status_code not in (200, 206):
+                error_message = (
+                    f"Failed to download '{path}' from Cloud Storage. "
+                    f"Status: {response.status_code}.\n"
+                    f"Message: {response.text}"
+                )
+                logger.error(error_message)
+                raise StorageError(error_message)
+
+            chunks = response.iter_content(self._chunk_size)
+            while True:
+                try:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                except requests.RequestException as exc:
+                    error_message = (
+                        f"Download of '{path}' from Cloud Storage failed. "
+                        f"Trigger exception: {exc.__class__.__name__}.\n"
+                        f"Message: {exc}"
+                    )
+                    logger.error(error_message)
+                    raise StorageError(error_message)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            response.close()
+
+    async def get_signed_url(
+        self, path: str, expiration: timedelta
+    ) -> Optional[str]:
+        blob = self._bucket.blob(path)
+        try:
+            await asyncio.to_thread(self._refresh_credentials)
+            service_account_email = getattr(
+                self._credentials, "service_account_email", None
+            )
+            if not service_account_email:
+                raise StorageError(
+                    "Credentials without a service account can not sign URLs"
+                )
+            # With the service account and an access token the library
+            # signs through IAM instead of with a local private key.
+            return await asyncio.to_thread(
+                blob.generate_signed_url,
+                version="v4",
+                expiration=expiration,
+                method="GET",
+                service_account_email=service_account_email,
+                access_token=self._credentials.token,
+            )
+        except (GoogleAuthError, StorageError) as exc:
+            error_message = (
+                f"Failed to sign URL for '{path}'. "
+                f"Trigger exception: {exc.__class__.__name__}.\n"
+                f"Message: {exc}"
+            )
+            logger.error(error_message)
+            raise StorageError(error_message)
+
+    def _refresh_credentials(self) -> None:
+        if not self._credentials.valid:
+            self._credentials.refresh(Request())
+
+    async def delete(self, path: str) -> None:
+        try:
+            await asyncio.to_thread(self._bucket.blob(path).delete)
+        except NotFound as exc:
+            raise self._not_found(path, exc)
+
+    async def _get_blob(self, path: str) -> Blob:
+        blob = await asyncio.to_thread(self._bucket.get_blob, path)
+        if blob is None:
+            raise self._not_found(path)
+        return blob
+
+    @staticmethod
+    def _not_found(
+        path: str, exc: Optional[NotFound] = None
+    ) -> StorageObjectNotFound:
+        error_message = f"Object '{path}' not found in Cloud Storage"
+        if exc is not None:
+            error_message += f".\nMessage: {exc}"
+        logger.warning(error_message)
+        return StorageObjectNotFound(error_message)
+
+
+@memory_profiler_class
+class LocalFileStorage(StorageBase):
+    """
+    Storage on the local filesystem, used in development and tests.
+
+    Uploads are written to a temporary file and moved into place when
+    complete. Downloads read from a memory-mapped file.
+    """
+
+    __slots__ = ("_root", "_chunk_size")
+
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE) -> None:
+        self._root = Path(root).resolve()
+        self._chunk_size = chunk_size
+
+    def _resolve(self, path: str) -> Path:
+        full_path = (self._root / path).resolve()
+        if not full_path.is_relative_to(self._root):
+            error_message = f"Path '{path}' is outside of the storage root"
+            logger.error(error_message)
+            raise StorageError(error_message)
+        return full_path
+
+    def _existing(self, path: str) -> Path:
+        full_path = self._resolve(path)
+        if not full_path.is_file():
+            error_message = f"Object '{path}' not found in local storage"
+            logger.warning(error_message)
+            raise StorageObjectNotFound(error_message)
+        return full_path
+
+    async def upload(
+        self,
+        path: str,
+        chunks: AsyncIterable[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        full_path = self._resolve(path)
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = full_path.with_name(f".{full_path.name}.{uuid.uuid4()}")
+
+        total = 0
+        try:
+            with open(temp_path, "wb") as file:
+                async for chunk in rechunk(chunks, self._chunk_size):
+                    await asyncio.to_thread(file.write, chunk)
+                    total += len(chunk)
+            os.replace(temp_path, full_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        return total
+
+    async def get_size(self, path: str) -> int:
+        return self._existing(path).stat().st_size
+
+    async def download(
+        self, path: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        full_path = self._existing(path)
+        size = full_path.stat().st_size
+        end = size - 1 if end is None else min(end, size - 1)
+        if size == 0 or start > end:
+            return
+
+        with open(full_path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for position in range(start, end + 1, self._chunk_size):
+                    chunk_end = min(position + self._chunk_size, end + 1)
+                    yield data[position:chunk_end]
+
+    async def get_signed_url(
+        self, path: str, expiration: timedelta
+    ) -> Optional[str]:
+        return None
+
+    async def delete(self, path: str) -> None:
+        self._existing(path).unlink()
+
+
+def create_google_credentials() -> tuple[Credentials, Optional[str]]:
+    try:
+        return google.auth.default(
+            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+    except GoogleAuthError as exc:
+        error_message = (
+            f"Failed to load Google Cloud credentials."
+            f"Trigger exception: {exc.__class__.__name__}.\n"
+            f"Message: {exc}"
+        )
+        logger.error(error_message)
+        raise ErrorWithGoogleCloudAuthentication(error_message)
+
+
+def create_google_storage_bucket(
+    bucket_name: str, credentials: Credentials, project: Optional[str]
+) -> Bucket:
+    try:
+        return Client(credentials=credentials, project=project).bucket(
+            bucket_name
+        )
+    except GoogleAuthError as exc:
+        error_message = (
+            f"Failed to create Google Cloud Storage client."
+            f"Trigger exception: {exc.__class__.__name__}.\n"
+            f"Message: {exc}"
+        )
+        logger.error(error_message)
+        raise ErrorWithGoogleCloudAuthentication(error_message)
+
+
+def create_storage(develop_mode: bool) -> StorageBase:
+    if develop_mode:
+        return LocalFileStorage(root=os.getenv("LOCAL_STORAGE_ROOT", "media"))
+
+    credentials, project = create_google_credentials()
+    return GoogleCloudStorage(
+        bucket=create_google_storage_bucket(
+            os.getenv("GOOGLE_STORAGE_BUCKET", ""), credentials, project
+        ),
+        credentials=credentials,
+    )
@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, Optional, Union
+
+from google.api_core.exceptions import (
+    AlreadyExists,
+    DeadlineExceeded,
+    GoogleAPICallError,
+    InternalServerError,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+from google.auth.exceptions import GoogleAuthError
+from google.cloud.tasks_v2 import CloudTasksAsyncClient, HttpMethod
+
+from app.core.exceptions import (
+    ErrorWithGoogleCloudAuthentication,
+    TaskDispatchError,
+    TaskEnqueueFailed,
+    TaskHandlerNotRegistered,
+)
+from app.utils.decorators import (
+    async_retry_with_backoff,
+    memory_profiler_class,
+)
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_CLOUD_TASKS_ERRORS = (
+    DeadlineExceeded,
+    InternalServerError,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+
+# Cloud Tasks rejects a reused task name for about an hour after the task
+# with that name was deleted or executed.
+IDEMPOTENCY_WINDOW = 3600.0
+
+
+class Task:
+    """
+    A unit of background work.
+
+    Args:
+    - name (str): Name of the registered handler that processes the task.
+    - payload (dict): JSON-serializable arguments passed to the handler.
+    - idempotency_key (str): Optional key. Tasks with the same key are
+                             enqueued only once.
+    """
+
+    __slots__ = ("name", "payload", "idempotency_key")
+
+    def __init__(
+        self,
+        name: str,
+        payload: Optional[dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.payload = payload or {}
+        self.idempotency_key = idempotency_key
+
+
+class TaskHandlerRegistry:
+    """
+    Maps task names to the functions that process them.
+
+    The same registry is shared by the dispatchers, which refuse to
+    enqueue tasks nobody can process, and by the code that runs the
+    tasks: the local dispatcher and the HTTP endpoint Cloud Tasks calls.
+    """
+
+    __slots__ = ("_handlers",)
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, Callable] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._handlers
+
+    def register(self, name: str, handler: Callable) -> None:
+        """
+        Registers the handler for the task name.
+
+        Args:
+        - name (str): Task name, also the last part of the handler URL.
+        - handler (Callable): Coroutine function or regular function that
+                              takes the task payload. Regular functions run
+                              in an executor and, for a process pool, must
+                              be picklable module-level functions.
+        """
+        self._handlers[name] = handler
+
+    def get(self, name: str) -> Callable:
+        handler = self._handlers.get(name)
+        if handler is None:
+            error_message = f"No handler registered for task '{name}'"
+            logger.error(error_message)
+            raise TaskHandlerNotRegistered(error_message)
+        return handler
+
+    async def run(
+        self,
+        name: str,
+        payload: dict[str, Any],
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """Runs the handler of the task with the given payload."""
+        handler = self.get(name)
+        if inspect.iscoroutinefunction(handler):
+            await handler(payload)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(executor, handler, payload)
+
+
+task_handlers = TaskHandlerRegistry()
+
+
+class TaskDispatcherBase(ABC):
+    """
+    Abstract base class for background task dispatching.
+
+    Request handlers only enqueue tasks, the heavy work runs elsewhere.
+    """
+
+    __slots__ = ("_handlers",)
+
+    def __init__(self, handlers: TaskHandlerRegistry) -> None:
+        self._handlers = handlers
+
+    def register(self, name: str, handler: Callable) -> None:
+        self._handlers.register(name, handler)
+
+    @abstractmethod
+    async def enqueue(self, task: Task) -> bool:
+        """
+        Puts the task into the queue.
+
+        Args:
+        - task (Task): The task to enqueue.
+
+        Returns:
+        - bool: True if the task was enqueued, False if a task with the
+                same idempotency key has already been enqueued.
+        """
+        pass
+
+    async def enqueue_batch(
+        self, tasks: Iterable[Task]
+    ) -> list[Union[bool, TaskDispatchError]]:
+        """
+        Puts several tasks into the queue concurrently.
+
+        A task that can not be enqueued does not affect the others: its
+        error is returned in its place instead of being raised.
+
+        Args:
+        - tasks (Iterable[Task]): The tasks to enqueue.
+
+        Returns:
+        - list: The result of 'enqueue' or the TaskDispatchError for every
+                task, in order.
+        """
+        results = await asyncio.gather(
+            *(self.enqueue(task) for task in tasks), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(
+                result, TaskDispatchError
+            ):
+                raise result
+        return list(results)  # type: ignore[arg-type]
+
+
+@memory_profiler_class
+class CloudTasksDispatcher(TaskDispatcherBase):
+    """
+    Dispatcher that creates HTTP tasks in a Google Cloud Tasks queue.
+
+    Every task is sent as a POST request with a JSON body to
+    '{handler_url}/{task.name}', signed with an OIDC token of the service
+    account so the endpoint can reject calls that do not come from Cloud
+    Tasks. Every task is named after its idempotency key, or a random ID
+    without one, so Cloud Tasks itself rejects duplicates, including the
+    ones a retry after a timeout would create.
+    """
+
+    __slots__ = (
+        "_client",
+        "_queue_path",
+        "_handler_url",
+        "_service_account_email",
+        "_semaphore",
+        "_retry",
+    )
+
+    def __init__(
+        self,
+        client: CloudTasksAsyncClient,
+        handlers: TaskHandlerRegistry,
+        project_id: str,
+        location: str,
+        queue: str,
+        handler_url: str,
+        service_account_email: str,
+        max_concurrency: int = 10,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+    ) -> None:
+        super().__init__(handlers)
+        self._client = client
+        self._queue_path = (
+            f"projects/{project_id}/locations/{location}/queues/{queue}"
+        )
+        self._handler_url = handler_url.rstrip("/")
+        self._service_account_email = service_account_email
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._retry = async_retry_with_backoff(
+            exceptions=TRANSIENT_CLOUD_TASKS_ERRORS,
+            max_attempts=max_attempts,
+            base_delay=base_delay,
+        )
+
+    async def enqueue(self, task: Task) -> bool:
+        self._handlers.get(task.name)
+        request = {"parent": self._queue_path, "task": self._build_task(task)}
+        attempts = 0
+
+        async def create_task() -> None:
+            nonlocal attempts
+            attempts += 1
+            try:
+                await self._client.create_task(request=request)
+            except AlreadyExists:
+                if attempts == 1:
+                    raise
+                # An earlier attempt timed out after the task was created.
+                logger.info(
+                    f"Task '{task.name}' was created by an earlier attempt"
+                )
+
+        try:
+            async with self._semaphore:
+                await self._retry(create_task)()
+        except AlreadyExists:
+            logger.info(
+                f"Task '{task.name}' with idempotency key "
+                f"'{task.idempotency_key}' has already been enqueued"
+            )
+            return False
+        except GoogleAPICallError as exc:
+            error_message = (
+                f"Failed to enqueue task '{task.name}' to Cloud Tasks. "
+                f"Trigger exception: {exc.__class__.__name__}.\n"
+                f"Message: {exc}"
+            )
+            logger.error(error_message)
+            raise TaskEnqueueFailed(error_message)
+
+        return True
+
+    def _build_task(self, task: Task) -> dict[str, Any]:
+        cloud_task: dict[str, Any] = {
+            "http_request": {
+                "http_method": HttpMethod.POST,
+                "url": f"{self._handler_url}/{task.name}",
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps(task.payload).encode(),
+                "oidc_token": {
+                    "service_account_email": self._service_account_email,
+                },
+            }
+        }
+        cloud_task["name"] = f"{self._queue_path}/tasks/{self._task_id(task)}"
+        return cloud_task
+
+    @staticmethod
+    def _task_id(task: Task) -> str:
+        if not task.idempotency_key:
+            return uuid.uuid4().hex
+        # Cloud Tasks allows only letters, digits, '-' and '_' in task IDs.
+        key = f"{task.name}:{task.idempotency_key}".encode()
+        return hashlib.sha256(key).hexdigest()
+
+
+@memory_profiler_class
+class LocalTaskDispatcher(TaskDispatcherBase):
+    """
+    In-process stand-in for Cloud Tasks, used in development and tests.
+
+    Coroutine handlers run on the event loop, regular functions run in
+    the given executor (the default thread pool if None). Like Cloud
+    Tasks, it remembers idempotency keys for 'idempotency_window' seconds.
+    """
+
+    __slots__ = (
+        "_executor",
+        "_semaphore",
+        "_retry",
+        "_idempotency_window",
+        "_seen_keys",
+        "_pending",
+    )
+
+    def __init__(
+        self,
+        handlers: TaskHandlerRegistry,
+        executor: Optional[Executor] = None,
+        max_concurrency: int = 10,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        idempotency_window: float = IDEMPOTENCY_WINDOW,
+    ) -> None:
+        super().__init__(handlers)
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._retry = async_retry_with_backoff(
+            max_attempts=max_attempts, base_delay=base_delay
+        )
+        self._idempotency_window = idempotency_window
+        # Keys in the order they were seen, with the time they expire at.
+        self._seen_keys: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._pending: set[asyncio.Task] = set()
+
+    async def enqueue(self, task: Task) -> bool:
+        self._handlers.get(task.name)
+
+        if task.idempotency_key:
+            now = time.monotonic()
+            self._forget_expired_keys(now)
+            key = (task.name, task.idempotency_key)
+            if key in self._seen_keys:
+                logger.info(
+                    f"Task '{task.name}' with idempotency key "
+                    f"'{task.idempotency_key}' has already been enqueued"
+                )
+                return False
+            self._seen_keys[key] = now + self._idempotency_window
+
+        running_task = asyncio.create_task(self._run(task))
+        self._pending.add(running_task)
+        running_task.add_done_callback(self._pending.discard)
+        return True
+
+    async def join(self) -> None:
+        """Waits until all enqueued tasks are finished."""
+        while self._pending:
+            await asyncio.gather(*self._pending)
+
+    def _forget_expired_keys(self, now: float) -> None:
+        # All keys share the same window, so they expire in insertion order.
+        while self._seen_keys:
+            key, expires_at = next(iter(self._seen_keys.items()))
+            if expires_at > now:
+                break
+            del self._seen_keys[key]
+
+    async def _run(self, task: Task) -> None:
+        async with self._semaphore:
+            try:
+                await self._retry(self._handlers.run)(
+                    task.name, task.payload, self._executor
+                )
+            except Exception as exc:
+                logger.error(
+                    f"Task '{task.name}' failed after all retries. "
+                    f"Trigger exception: {exc.__class__.__name__}.\n"
+                    f"Message: {exc}"
+                )
+
+
+def create_cloud_tasks_client() -> CloudTasksAsyncClient:
+    try:
+        return CloudTasksAsyncClient()
+    except GoogleAuthError as exc:
+        error_message = (
+            f"Failed to create Google Cloud Tasks client."
+            f"Trigger exception: {exc.__class__.__name__}.\n"
+            f"Message: {exc}"
+        )
+        logger.error(error_message)
+        raise ErrorWithGoogleCloudAuthentication(error_message)
+
+
+def create_task_dispatcher(
+    develop_mode: bool, handlers: TaskHandlerRegistry = task_handlers
+) -> TaskDispatcherBase:
+    if develop_mode:
+        return LocalTaskDispatcher(handlers=handlers)
+
+    return CloudTasksDispatcher(
+        client=create_cloud_tasks_client(),
+        handlers=handlers,
+        project_id=os.getenv("GOOGLE_PROJECT_ID", ""),
+        location=os.getenv("GOOGLE_TASKS_LOCATION", ""),
+        queue=os.getenv("GOOGLE_TASKS_QUEUE", ""),
+        handler_url=os.getenv("TASKS_HANDLER_URL", ""),
+        service_account_email=os.getenv("TASKS_SERVICE_ACCOUNT_EMAIL", ""),
+    )
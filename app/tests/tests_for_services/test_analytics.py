@@ -0,0 +1,258 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import create_database_engine, create_session_factory
+from app.models import Athlete, BaseModel, Result
+from app.services.analytics import (
+    PerformanceAnalyticsService,
+    ResultSeries,
+    build_postgresql_series_query,
+    compute_performance_stats,
+    fetch_result_series,
+)
+
+START_DATE = datetime(2025, 1, 1)
+
+
+def make_rows(athletes=20, max_results=15, seed=42):
+    generator = np.random.default_rng(seed)
+    rows = []
+    for athlete_id in range(1, athletes + 1):
+        for day in range(int(generator.integers(1, max_results))):
+            value = float(np.round(generator.uniform(10.0, 12.0), 2))
+            rows.append((athlete_id, value, START_DATE + timedelta(days=day)))
+    return rows
+
+
+def to_series(rows):
+    return ResultSeries.from_rows(
+        (
+            athlete_id,
+            value,
+            recorded_at.replace(tzinfo=timezone.utc).timestamp(),
+        )
+        for athlete_id, value, recorded_at in rows
+    )
+
+
+class TestComputePerformanceStats(unittest.TestCase):
+    def assert_matches_naive(self, rows, lower_is_better):
+        stats = compute_performance_stats(
+            to_series(rows),
+            lower_is_better=lower_is_better,
+            window=3,
+            percentiles=(25.0, 50.0, 90.0),
+        )
+
+        athlete_ids = sorted({athlete_id for athlete_id, _, _ in rows})
+        self.assertEqual(sorted(stats), athlete_ids)
+        best = min if lower_is_better else max
+        for athlete_id in athlete_ids:
+            values = [value for aid, value, _ in rows if aid == athlete_id]
+            athlete_stats = stats[athlete_id]
+
+            self.assertEqual(athlete_stats.count, len(values))
+            self.assertEqual(athlete_stats.personal_best, best(values))
+            self.assertAlmostEqual(athlete_stats.mean, np.mean(values))
+            self.assertAlmostEqual(
+                athlete_stats.rolling_average, np.mean(values[-3:])
+            )
+            for percentile in (25.0, 50.0, 90.0):
+                self.assertAlmostEqual(
+                    athlete_stats.percentiles[percentile],
+                    np.percentile(values, percentile),
+                )
+            self.assertEqual(
+                athlete_stats.progression_values.tolist(),
+                [best(values[: i + 1]) for i in range(len(values))],
+            )
+            self.assertEqual(
+                athlete_stats.latest_recorded_at,
+                np.datetime64(START_DATE + timedelta(len(values) - 1)),
+            )
+
+    def test_lower_is_better_matches_naive_computation(self):
+        self.assert_matches_naive(make_rows(), lower_is_better=True)
+
+    def test_higher_is_better_matches_naive_computation(self):
+        self.assert_matches_naive(make_rows(), lower_is_better=False)
+
+    def test_progression_does_not_share_memory_with_series(self):
+        stats = compute_performance_stats(to_series(make_rows()))
+
+        for athlete_stats in stats.values():
+            self.assertIsNone(athlete_stats.progression_dates.base)
+            self.assertIsNone(athlete_stats.progression_values.base)
+
+    def test_empty_series(self):
+        self.assertEqual(compute_performance_stats(to_series([])), {})
+
+
+class TestPerformanceAnalyticsService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_database_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+        self.session_factory = create_session_factory(self.engine)
+
+        self.rows = make_rows(athletes=5)
+        async with self.session_factory() as session:
+            session.add_all(
+                Athlete(id=athlete_id, first_name="Name", last_name="Last")
+                for athlete_id in range(1, 6)
+            )
+            session.add_all(
+                Result(
+                    athlete_id=athlete_id,
+                    event="100m",
+                    value=value,
+                    recorded_at=recorded_at,
+                )
+                for athlete_id, value, recorded_at in self.rows
+            )
+            session.add(
+                Result(
+                    athlete_id=1,
+                    event="long_jump",
+                    value=7.5,
+                    recorded_at=START_DATE,
+                )
+            )
+            await session.commit()
+
+        self.service = PerformanceAnalyticsService(
+            self.session_factory, window=3
+        )
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_get_stats_matches_in_memory_computation(self):
+        stats = await self.service.get_stats("100m", [1, 2, 3, 4, 5, 99])
+
+        expected = compute_performance_stats(to_series(self.rows), window=3)
+        self.assertEqual(sorted(stats), [1, 2, 3, 4, 5])
+        for athlete_id, athlete_stats in stats.items():
+            self.assertEqual(
+                athlete_stats.personal_best,
+                expected[athlete_id].personal_best,
+            )
+            self.assertEqual(athlete_stats.count, expected[athlete_id].count)
+            self.assertAlmostEqual(
+                athlete_stats.rolling_average,
+                expected[athlete_id].rolling_average,
+            )
+
+    async def test_only_changed_athletes_are_recomputed(self):
+        await self.service.get_stats("100m", [1, 2, 3])
+
+        async with self.session_factory() as session:
+            session.add(
+                Result(
+                    athlete_id=2,
+                    event="100m",
+                    value=9.5,
+                    recorded_at=START_DATE + timedelta(days=100),
+                )
+            )
+            await session.commit()
+
+        with patch(
+            "app.services.analytics.compute_performance_stats",
+            wraps=compute_performance_stats,
+        ) as mock_compute:
+            stats = await self.service.get_stats("100m", [1, 2, 3])
+
+        series = mock_compute.call_args.args[0]
+        self.assertEqual(set(series.athlete_ids.tolist()), {2})
+        self.assertEqual(stats[2].personal_best, 9.5)
+        self.assertEqual(sorted(stats), [1, 2, 3])
+
+    async def test_unchanged_results_are_served_from_cache(self):
+        first = await self.service.get_stats("100m", [1, 2])
+
+        with patch(
+            "app.services.analytics.compute_performance_stats"
+        ) as mock_compute:
+            second = await self.service.get_stats("100m", [1, 2])
+
+        mock_compute.assert_not_called()
+        self.assertIs(first[1], second[1])
+
+    async def test_events_are_cached_separately(self):
+        await self.service.get_stats("100m", [1])
+
+        stats = await self.service.get_stats("long_jump", [1])
+
+        self.assertEqual(stats[1].personal_best, 7.5)
+        self.assertEqual(stats[1].count, 1)
+
+    async def test_direction_is_decided_by_event(self):
+        async with self.session_factory() as session:
+            session.add(
+                Result(
+                    athlete_id=1,
+                    event="long_jump",
+                    value=7.2,
+                    recorded_at=START_DATE + timedelta(days=1),
+                )
+            )
+            await session.commit()
+
+        long_jump = await self.service.get_stats("long_jump", [1])
+        sprint = await self.service.get_stats("100m", [1])
+
+        self.assertEqual(long_jump[1].personal_best, 7.5)
+        self.assertEqual(long_jump[1].progression_values.tolist(), [7.5, 7.5])
+        self.assertEqual(
+            sprint[1].personal_best,
+            min(value for aid, value, _ in self.rows if aid == 1),
+        )
+
+
+class TestPostgresqlSeries(unittest.IsolatedAsyncioTestCase):
+    def test_query_aggregates_ordered_columns(self):
+        sql = str(
+            build_postgresql_series_query("100m", [1, 2]).compile(
+                dialect=postgresql.dialect()
+            )
+        )
+
+        self.assertEqual(sql.count("array_agg("), 3)
+        self.assertEqual(
+            sql.count(
+                "ORDER BY results.athlete_id, results.recorded_at, results.id"
+            ),
+            3,
+        )
+
+    async def test_batches_are_concatenated(self):
+        mock_session = MagicMock()
+        mock_session.get_bind.return_value.dialect.name = "postgresql"
+        mock_session.execute = AsyncMock(
+            side_effect=[
+                MagicMock(
+                    **{
+                        "one.return_value": (
+                            [1, 1],
+                            [10.5, 10.2],
+                            [0.0, 86400.0],
+                        )
+                    }
+                ),
+                MagicMock(**{"one.return_value": (None, None, None)}),
+            ]
+        )
+
+        with patch("app.services.analytics.QUERY_BATCH_SIZE", 1):
+            series = await fetch_result_series(mock_session, "100m", [1, 2])
+
+        self.assertEqual(series.athlete_ids.tolist(), [1, 1])
+        self.assertEqual(series.values.tolist(), [10.5, 10.2])
+        self.assertEqual(
+            series.recorded_at[1], np.datetime64("1970-01-02T00:00:00")
+        )
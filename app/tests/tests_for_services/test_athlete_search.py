@@ -0,0 +1,203 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import create_database_engine, create_session_factory
+from app.models import Athlete, BaseModel
+from app.services.athlete_search import (
+    AthleteSearchService,
+    PrefixIndex,
+    build_postgresql_search,
+    normalize,
+    trigram_similarity,
+    word_similarity,
+)
+
+ATHLETES = [
+    (1, "John", "Smith"),
+    (2, "Jon", "Smyth"),
+    (3, "Joanna", "Johnson"),
+    (4, "Ólafur", "Eliasson"),
+    (5, "Maria", "Smith"),
+]
+
+
+def athlete_ids(hits):
+    return [hit.athlete_id for hit in hits]
+
+
+class TestTrigramSimilarity(unittest.TestCase):
+    def test_matches_pg_trgm(self):
+        # Values from the pg_trgm documentation.
+        self.assertAlmostEqual(
+            trigram_similarity("word", "two words"), 0.363636, places=6
+        )
+        self.assertEqual(trigram_similarity("word", "word"), 1.0)
+        self.assertEqual(trigram_similarity("word", ""), 0.0)
+        self.assertAlmostEqual(word_similarity("word", "two words"), 0.8)
+        self.assertEqual(word_similarity("word", "word"), 1.0)
+        self.assertEqual(word_similarity("", "word"), 0.0)
+
+    def test_accents_are_kept(self):
+        # Like 'pg_trgm', which compares 'ó' and 'o' as different letters.
+        self.assertLess(trigram_similarity("Olafur", "Ólafur"), 1.0)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("Ólafur ELIASSON"), "olafur eliasson")
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex(ATHLETES)
+
+    def test_search_by_any_name_word(self):
+        self.assertEqual(athlete_ids(self.index.search("smi")), [1, 5])
+        self.assertEqual(athlete_ids(self.index.search("jo")), [2, 1, 3])
+        self.assertEqual(athlete_ids(self.index.search("OLA")), [4])
+        self.assertEqual(athlete_ids(self.index.search("john sm")), [1])
+        self.assertEqual(self.index.search("  "), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("j", limit=2)), 2)
+
+    def test_exact_matches_rank_first(self):
+        self.index.add(6, "Jo", "Berg")
+
+        hits = self.index.search("jo", limit=2)
+
+        self.assertEqual(athlete_ids(hits), [6, 2])
+        self.assertEqual(hits[0].score, 1.0)
+        self.assertEqual(
+            athlete_ids(self.index.search("john smith", limit=1)), [1]
+        )
+
+    def test_incremental_updates(self):
+        self.index.add(6, "Jonas", "Berg")
+        self.index.add(1, "Johnny", "Smith")
+        self.index.remove(5)
+
+        self.assertEqual(athlete_ids(self.index.search("jona")), [6])
+        self.assertEqual(athlete_ids(self.index.search("smith")), [1])
+        self.assertEqual(self.index.search("johnny")[0].first_name, "Johnny")
+        self.assertEqual(len(self.index), 5)
+
+
+class TestBuildPostgresqlSearch(unittest.TestCase):
+    def test_uses_indexed_expressions(self):
+        sql = str(
+            build_postgresql_search("jon smith", 10).compile(
+                dialect=postgresql.dialect()
+            )
+        )
+
+        self.assertIn(
+            "<%% (athletes.first_name || ' ' || athletes.last_name)", sql
+        )
+        self.assertIn(
+            "to_tsvector('simple', athletes.first_name || ' ' || "
+            "athletes.last_name)",
+            sql,
+        )
+
+
+class TestAthleteSearchService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_database_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+        self.session_factory = create_session_factory(self.engine)
+
+        async with self.session_factory() as session:
+            session.add_all(
+                Athlete(id=athlete_id, first_name=first, last_name=last)
+                for athlete_id, first, last in ATHLETES
+            )
+            await session.commit()
+
+        self.service = AthleteSearchService(self.session_factory)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_search_tolerates_typos_and_word_order(self):
+        hits = await self.service.search("smith jon")
+
+        self.assertEqual(athlete_ids(hits)[:2], [1, 2])
+        self.assertEqual(
+            [hit.score for hit in hits],
+            sorted((hit.score for hit in hits), reverse=True),
+        )
+        self.assertEqual(
+            athlete_ids(await self.service.search("ólafur eliasson")), [4]
+        )
+        self.assertEqual(await self.service.search("xyz"), [])
+
+    async def test_search_ranks_like_postgresql(self):
+        hits = await self.service.search("smitth")
+
+        # Equal word similarity, ties broken by whole-name similarity.
+        self.assertEqual(athlete_ids(hits), [1, 5])
+        self.assertEqual(hits[0].score, hits[1].score)
+
+    async def test_search_matches_whole_words(self):
+        async with self.session_factory() as session:
+            session.add(
+                Athlete(id=6, first_name="Li Anna Maria", last_name="Wu")
+            )
+            await session.commit()
+
+        # The word similarity is below the threshold, but both words match.
+        hits = await self.service.search("wu li")
+
+        self.assertEqual(athlete_ids(hits), [6])
+        self.assertLess(hits[0].score, 0.6)
+
+    async def test_autocomplete_is_refreshed_incrementally(self):
+        self.assertEqual(
+            athlete_ids(await self.service.autocomplete("smi")), [1, 5]
+        )
+
+        async with self.session_factory() as session:
+            athlete = Athlete(id=6, first_name="Sam", last_name="Smithers")
+            session.add(athlete)
+            await session.commit()
+            await session.refresh(athlete)
+            self.service.index_athletes([athlete])
+        self.service.remove_athlete(5)
+
+        self.assertEqual(
+            athlete_ids(await self.service.autocomplete("smi")), [1, 6]
+        )
+
+    async def test_updates_during_load_are_kept(self):
+        loads = 0
+
+        @asynccontextmanager
+        async def racing_session_factory():
+            nonlocal loads
+            loads += 1
+            async with self.session_factory() as session:
+                execute = session.execute
+
+                async def execute_then_update(statement):
+                    rows = await execute(statement)
+                    # Updates arriving after the snapshot was read.
+                    self.service.index_athletes(
+                        [Athlete(id=6, first_name="Sam", last_name="Smithers")]
+                    )
+                    self.service.remove_athlete(5)
+                    return rows
+
+                session.execute = execute_then_update
+                yield session
+
+        self.service = AthleteSearchService(racing_session_factory)
+        first, second = await asyncio.gather(
+            self.service.autocomplete("smi"), self.service.autocomplete("smi")
+        )
+
+        self.assertEqual(athlete_ids(first), [1, 6])
+        self.assertEqual(athlete_ids(second), [1, 6])
+        self.assertEqual(loads, 1)
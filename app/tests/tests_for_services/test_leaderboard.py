@@ -0,0 +1,313 @@
+import random
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import Integer, cast, extract, func, select
+
+from app.core.database import create_database_engine, create_session_factory
+from app.models import Athlete, BaseModel, LeaderboardEntry, Result
+from app.services.leaderboard import (
+    ALL_AGE_GROUPS,
+    LeaderboardService,
+    SortedLeaderboard,
+    get_age_group,
+)
+
+SEASONS = (2024, 2025)
+
+
+def as_tuples(rows):
+    return [(row.rank, row.athlete_id, row.value) for row in rows]
+
+
+class TestGetAgeGroup(unittest.TestCase):
+    def test_age_groups(self):
+        self.assertEqual(get_age_group(date(2008, 12, 31), 2025), "U18")
+        self.assertEqual(get_age_group(date(2006, 1, 1), 2025), "U20")
+        self.assertEqual(get_age_group(date(2003, 6, 1), 2025), "U23")
+        self.assertEqual(get_age_group(date(1991, 6, 1), 2025), "SENIOR")
+        self.assertEqual(get_age_group(date(1990, 6, 1), 2025), "MASTERS")
+        self.assertIsNone(get_age_group(None, 2025))
+
+
+class TestSortedLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.board = SortedLeaderboard(
+            [(10.5, 1, 10.5), (10.1, 2, 10.1), (10.5, 3, 10.5)]
+        )
+
+    def test_ties_share_rank(self):
+        self.assertEqual(
+            as_tuples(self.board.get_top(limit=10)),
+            [(1, 2, 10.1), (2, 1, 10.5), (2, 3, 10.5)],
+        )
+        self.assertEqual(self.board.get_rank(3).rank, 2)
+
+    def test_update(self):
+        self.assertFalse(self.board.update(2, 10.3, 10.3))
+        self.assertTrue(self.board.update(3, 10.0, 10.0))
+        self.assertTrue(self.board.update(4, 11.0, 11.0))
+
+        self.assertEqual(
+            as_tuples(self.board.get_top(limit=10)),
+            [(1, 3, 10.0), (2, 2, 10.1), (3, 1, 10.5), (4, 4, 11.0)],
+        )
+        self.assertEqual(len(self.board), 4)
+
+    def test_remove(self):
+        self.board.remove(2)
+        self.board.remove(99)
+
+        self.assertEqual(
+            as_tuples(self.board.get_top(limit=10)),
+            [(1, 1, 10.5), (1, 3, 10.5)],
+        )
+        self.assertIsNone(self.board.get_rank(2))
+
+    def test_pages(self):
+        self.assertEqual(
+            as_tuples(self.board.get_top(limit=2, offset=1)),
+            [(2, 1, 10.5), (2, 3, 10.5)],
+        )
+        self.assertEqual(self.board.get_top(limit=2, offset=5), [])
+        self.assertIsNone(self.board.get_rank(99))
+
+
+class TestLeaderboardService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_database_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+        self.session_factory = create_session_factory(self.engine)
+        self.service = LeaderboardService(self.session_factory)
+
+        self.random = random.Random(7)
+        async with self.session_factory() as session:
+            session.add_all(
+                Athlete(
+                    id=athlete_id,
+                    first_name="Name",
+                    last_name="Last",
+                    birth_date=(
+                        date(self.random.randint(1985, 2010), 5, 1)
+                        if athlete_id % 5
+                        else None
+                    ),
+                )
+                for athlete_id in range(1, 41)
+            )
+            await session.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def add_results(self, results, service=None):
+        async with self.session_factory() as session:
+            await (service or self.service).add_results(session, results)
+            await session.commit()
+
+    def make_results(self, event, count, low, high):
+        return [
+            Result(
+                athlete_id=self.random.randint(1, 40),
+                event=event,
+                # Rounded values produce ties.
+                value=round(self.random.uniform(low, high), 1),
+                recorded_at=datetime(
+                    self.random.choice(SEASONS),
+                    self.random.randint(1, 12),
+                    self.random.randint(1, 28),
+                ),
+            )
+            for _ in range(count)
+        ]
+
+    async def naive_ranking(self, event, season, age_group, lower_is_better):
+        birth_dates = await self.fetch_birth_dates()
+        athlete_ids = [
+            athlete_id
+            for athlete_id, birth_date in birth_dates.items()
+            if age_group == ALL_AGE_GROUPS
+            or get_age_group(birth_date, season) == age_group
+        ]
+        best = (
+            func.min(Result.value)
+            if lower_is_better
+            else func.max(Result.value)
+        )
+        grouped = (
+            select(Result.athlete_id, best.label("best"))
+            .where(
+                Result.event == event,
+                cast(extract("year", Result.recorded_at), Integer) == season,
+                Result.athlete_id.in_(athlete_ids),
+            )
+            .group_by(Result.athlete_id)
+            .subquery()
+        )
+        order = grouped.c.best if lower_is_better else grouped.c.best.desc()
+        ranking = select(
+            func.rank().over(order_by=order),
+            grouped.c.athlete_id,
+            grouped.c.best,
+        ).order_by(order, grouped.c.athlete_id)
+
+        async with self.session_factory() as session:
+            return [tuple(row) for row in await session.execute(ranking)]
+
+    async def fetch_birth_dates(self):
+        async with self.session_factory() as session:
+            rows = await session.execute(
+                select(Athlete.id, Athlete.birth_date)
+            )
+            return dict(rows.tuples().all())
+
+    async def assert_matches_naive(self, event, lower_is_better):
+        for season in SEASONS:
+            for age_group in (ALL_AGE_GROUPS, "U20", "SENIOR", "MASTERS"):
+                expected = await self.naive_ranking(
+                    event, season, age_group, lower_is_better
+                )
+                top = await self.service.get_top(
+                    event, season, age_group, limit=100
+                )
+                self.assertEqual(as_tuples(top), expected)
+
+                for rank, athlete_id, value in expected:
+                    row = await self.service.get_rank(
+                        event, season, athlete_id, age_group
+                    )
+                    self.assertEqual((row.rank, row.value), (rank, value))
+
+    async def test_incremental_updates_match_naive_ranking(self):
+        for batch in range(4):
+            await self.add_results(self.make_results("100m", 50, 10.0, 13.0))
+            if batch == 1:
+                # Loaded leaderboards are updated in memory from now on.
+                await self.assert_matches_naive("100m", True)
+
+        await self.assert_matches_naive("100m", True)
+
+    async def test_higher_is_better_event(self):
+        for _ in range(3):
+            await self.add_results(
+                self.make_results("long_jump", 40, 5.0, 8.5)
+            )
+
+        await self.assert_matches_naive("long_jump", False)
+
+    async def test_mixed_events_in_one_batch(self):
+        await self.add_results(
+            self.make_results("100m", 30, 10.0, 13.0)
+            + self.make_results("long_jump", 30, 5.0, 8.5)
+        )
+
+        await self.assert_matches_naive("100m", True)
+        await self.assert_matches_naive("long_jump", False)
+
+    async def test_configured_higher_is_better_events(self):
+        service = LeaderboardService(
+            self.session_factory, higher_is_better_events={"points"}
+        )
+        await self.add_results(
+            self.make_results("points", 40, 0, 100), service
+        )
+
+        self.service = service
+        await self.assert_matches_naive("points", False)
+
+    async def test_rebuild_matches_incremental_updates(self):
+        await self.add_results(self.make_results("100m", 100, 10.0, 13.0))
+        async with self.session_factory() as session:
+            incremental = (
+                await session.execute(
+                    select(LeaderboardEntry).order_by(
+                        LeaderboardEntry.season,
+                        LeaderboardEntry.age_group,
+                        LeaderboardEntry.athlete_id,
+                    )
+                )
+            ).scalars()
+            incremental_rows = [
+                (entry.season, entry.age_group, entry.athlete_id, entry.score)
+                for entry in incremental
+            ]
+
+        async with self.session_factory() as session:
+            await self.service.rebuild(session, "100m")
+            await session.commit()
+
+        async with self.session_factory() as session:
+            rebuilt = await session.execute(
+                select(
+                    LeaderboardEntry.season,
+                    LeaderboardEntry.age_group,
+                    LeaderboardEntry.athlete_id,
+                    LeaderboardEntry.score,
+                ).order_by(
+                    LeaderboardEntry.season,
+                    LeaderboardEntry.age_group,
+                    LeaderboardEntry.athlete_id,
+                )
+            )
+            self.assertEqual([tuple(row) for row in rebuilt], incremental_rows)
+        await self.assert_matches_naive("100m", True)
+
+    async def test_results_stay_usable_after_commit(self):
+        results = self.make_results("100m", 5, 10.0, 13.0)
+        async with self.session_factory() as session:
+            await self.service.add_results(session, results)
+            await session.flush()
+            self.assertTrue(all(result.id for result in results))
+            self.assertTrue(all(result in session for result in results))
+            await session.commit()
+
+    async def test_rollback_leaves_leaderboards_unchanged(self):
+        await self.add_results(self.make_results("100m", 50, 10.0, 13.0))
+        await self.assert_matches_naive("100m", True)
+
+        async with self.session_factory() as session:
+            await self.service.add_results(
+                session, self.make_results("100m", 50, 9.0, 9.5)
+            )
+            await session.rollback()
+
+        await self.assert_matches_naive("100m", True)
+
+    async def test_removed_and_corrected_results(self):
+        results = self.make_results("100m", 80, 10.0, 13.0)
+        await self.add_results(results)
+        await self.assert_matches_naive("100m", True)
+
+        async with self.session_factory() as session:
+            results = (
+                (await session.execute(select(Result).order_by(Result.value)))
+                .scalars()
+                .all()
+            )
+            removed = results[:10]
+            await self.service.remove_results(session, removed)
+
+            corrected = results[-1]
+            old_key = (
+                corrected.event,
+                corrected.recorded_at.year,
+                corrected.athlete_id,
+            )
+            corrected.value = 14.0
+            await self.service.recompute_entries(session, [old_key])
+            await session.commit()
+
+        await self.assert_matches_naive("100m", True)
+
+    async def test_loaded_leaderboards_are_bounded(self):
+        service = LeaderboardService(self.session_factory, max_boards=2)
+        await service.get_top("100m", 2024)
+        await service.get_top("100m", 2025)
+        await service.get_top("100m", 2024)
+        await service.get_top("100m", 2024, "U20")
+
+        self.assertEqual(
+            list(service._boards),
+            [("100m", 2024, ALL_AGE_GROUPS), ("100m", 2024, "U20")],
+        )
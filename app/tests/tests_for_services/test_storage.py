@@ -0,0 +1,373 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import requests
+from google.api_core.exceptions import NotFound
+from google.auth.exceptions import TransportError
+
+from app.core.exceptions import (
+    InvalidByteRange,
+    StorageError,
+    StorageObjectNotFound,
+    TransientStorageError,
+)
+from app.services.storage import (
+    GoogleCloudStorage,
+    LocalFileStorage,
+    parse_range_header,
+    rechunk,
+)
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestParseRangeHeader(unittest.TestCase):
+    def test_closed_range(self):
+        self.assertEqual(parse_range_header("bytes=0-99", 1000), (0, 99))
+
+    def test_open_range(self):
+        self.assertEqual(parse_range_header("bytes=900-", 1000), (900, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header("bytes=-100", 1000), (900, 999))
+
+    def test_end_is_clamped_to_size(self):
+        self.assertEqual(parse_range_header("bytes=10-5000", 100), (10, 99))
+
+    def test_invalid_ranges(self):
+        for header in ("bytes=-", "items=0-1", "bytes=100-", "bytes=5-1"):
+            with self.subTest(header=header):
+                with self.assertRaises(InvalidByteRange):
+                    parse_range_header(header, 100)
+
+
+class TestRechunk(unittest.IsolatedAsyncioTestCase):
+    async def test_regroups_into_fixed_size_chunks(self):
+        chunks = await collect(
+            rechunk(stream(b"ab", b"cdefg", b"", b"hij"), chunk_size=4)
+        )
+
+        self.assertEqual(chunks, [b"abcd", b"efgh", b"ij"])
+
+
+class TestLocalFileStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.storage = LocalFileStorage(self.temp_dir.name, chunk_size=4)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def test_upload_and_download(self):
+        size = await self.storage.upload(
+            "athletes/1/photo.jpg", stream(b"0123", b"456789")
+        )
+
+        self.assertEqual(size, 10)
+        self.assertEqual(
+            await self.storage.get_size("athletes/1/photo.jpg"), 10
+        )
+        chunks = await collect(self.storage.download("athletes/1/photo.jpg"))
+        self.assertEqual(chunks, [b"0123", b"4567", b"89"])
+        self.assertEqual(
+            os.listdir(f"{self.temp_dir.name}/athletes/1"), ["photo.jpg"]
+        )
+
+    async def test_download_range(self):
+        await self.storage.upload("video.mp4", stream(b"0123456789"))
+
+        chunks = await collect(self.storage.download("video.mp4", 3, 8))
+
+        self.assertEqual(b"".join(chunks), b"345678")
+
+    async def test_empty_object(self):
+        size = await self.storage.upload("empty.bin", stream())
+
+        self.assertEqual(size, 0)
+        self.assertEqual(await collect(self.storage.download("empty.bin")), [])
+
+    async def test_failed_upload_leaves_no_files(self):
+        async def broken_stream():
+            yield b"0123"
+            raise ConnectionError("client disconnected")
+
+        with self.assertRaises(ConnectionError):
+            await self.storage.upload("broken.bin", broken_stream())
+
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    async def test_missing_object(self):
+        with self.assertRaises(StorageObjectNotFound):
+            await collect(self.storage.download("missing.bin"))
+        with self.assertRaises(StorageObjectNotFound):
+            await self.storage.delete("missing.bin")
+
+    async def test_path_outside_root(self):
+        with self.assertRaises(StorageError):
+            await self.storage.upload("../escape.bin", stream(b"data"))
+
+    async def test_delete_and_signed_url(self):
+        await self.storage.upload("photo.jpg", stream(b"data"))
+
+        self.assertIsNone(
+            await self.storage.get_signed_url("photo.jpg", timedelta(hours=1))
+        )
+        await self.storage.delete("photo.jpg")
+        with self.assertRaises(StorageObjectNotFound):
+            await self.storage.get_size("photo.jpg")
+
+
+class TestGoogleCloudStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.mock_bucket = MagicMock()
+        self.mock_blob = self.mock_bucket.blob.return_value
+        self.mock_blob.create_resumable_upload_session.return_value = (
+            "https://upload/session"
+        )
+        self.mock_bucket.get_blob.return_value = self.mock_blob
+        self.mock_blob.size = 10
+        self.mock_blob.media_link = "https://media/video.mp4?generation=7"
+        self.mock_credentials = MagicMock(
+            valid=True,
+            token="access-token",
+            service_account_email="storage@project.iam.gserviceaccount.com",
+        )
+        self.mock_session = MagicMock()
+        self.storage = GoogleCloudStorage(
+            bucket=self.mock_bucket,
+            credentials=self.mock_credentials,
+            session=self.mock_session,
+            chunk_size=4,
+            base_delay=0,
+        )
+
+    def set_put_responses(self, *responses):
+        """
+        Every response is a status, or a 308 status with the number of
+        bytes the server has persisted.
+        """
+        side_effect = []
+        for response in responses:
+            if isinstance(response, tuple):
+                status, persisted = response
+                headers = {"Range": f"bytes=0-{persisted - 1}"}
+            else:
+                status, headers = response, {}
+            side_effect.append(
+                MagicMock(status_code=status, headers=headers, text="")
+            )
+        self.mock_session.put.side_effect = side_effect
+
+    def sent_ranges(self):
+        return [
+            call.kwargs["headers"]["Content-Range"]
+            for call in self.mock_session.put.call_args_list
+        ]
+
+    async def test_resumable_upload_in_chunks(self):
+        self.set_put_responses((308, 4), (308, 8), 200)
+
+        size = await self.storage.upload(
+            "video.mp4", stream(b"0123456", b"789"), content_type="video/mp4"
+        )
+
+        self.assertEqual(size, 10)
+        self.mock_blob.create_resumable_upload_session.assert_called_once_with(
+            content_type="video/mp4"
+        )
+        self.assertEqual(
+            self.sent_ranges(),
+            ["bytes 0-3/*", "bytes 4-7/*", "bytes 8-9/10"],
+        )
+
+    async def test_upload_of_exact_multiple_of_chunk_size(self):
+        self.set_put_responses((308, 4), 200)
+
+        size = await self.storage.upload("video.mp4", stream(b"01234567"))
+
+        self.assertEqual(size, 8)
+        self.assertEqual(self.sent_ranges(), ["bytes 0-3/*", "bytes 4-7/8"])
+
+    async def test_empty_upload(self):
+        self.set_put_responses(200)
+
+        size = await self.storage.upload("empty.bin", stream())
+
+        self.assertEqual(size, 0)
+        self.assertEqual(self.sent_ranges(), ["bytes */0"])
+
+    async def test_partly_persisted_chunk_is_resent(self):
+        self.set_put_responses((308, 2), (308, 4), 200)
+
+        await self.storage.upload("video.mp4", stream(b"012345"))
+
+        self.assertEqual(
+            self.sent_ranges(),
+            ["bytes 0-3/*", "bytes 2-3/*", "bytes 4-5/6"],
+        )
+
+    async def test_transient_error_resumes_from_persisted_offset(self):
+        self.set_put_responses(503, (308, 2), (308, 4), 200)
+
+        size = await self.storage.upload("video.mp4", stream(b"012345"))
+
+        self.assertEqual(size, 6)
+        self.assertEqual(
+            self.sent_ranges(),
+            ["bytes 0-3/*", "bytes */*", "bytes 2-3/*", "bytes 4-5/6"],
+        )
+
+    async def test_connection_error_is_retried(self):
+        self.mock_session.put.side_effect = [
+            requests.ConnectionError("reset"),
+            MagicMock(status_code=308, headers={}, text=""),
+            MagicMock(status_code=200, headers={}, text=""),
+        ]
+
+        size = await self.storage.upload("video.mp4", stream(b"01"))
+
+        self.assertEqual(size, 2)
+        self.assertEqual(
+            self.sent_ranges(), ["bytes 0-1/2", "bytes */2", "bytes 0-1/2"]
+        )
+
+    async def test_exhausted_retries_raise(self):
+        self.set_put_responses(503, 503, 503)
+
+        with self.assertRaises(TransientStorageError):
+            await self.storage.upload("video.mp4", stream(b"0123456789"))
+        self.assertEqual(self.mock_session.put.call_count, 3)
+
+    async def test_permanent_error_raises(self):
+        self.set_put_responses(403)
+
+        with self.assertRaises(StorageError):
+            await self.storage.upload("video.mp4", stream(b"0123456789"))
+        self.assertEqual(self.mock_session.put.call_count, 1)
+
+    async def test_lost_bytes_raise(self):
+        self.set_put_responses((308, 4), (308, 2))
+
+        with self.assertRaises(StorageError):
+            await self.storage.upload("video.mp4", stream(b"0123456789"))
+
+    def set_get_response(self, status, chunks=()):
+        self.mock_session.get.return_value = MagicMock(
+            status_code=status, text=""
+        )
+        self.mock_session.get.return_value.iter_content.return_value = iter(
+            chunks
+        )
+
+    async def test_download_range_in_one_request(self):
+        self.set_get_response(206, [b"2345", b"67"])
+
+        chunks = await collect(self.storage.download("video.mp4", 2, 7))
+
+        self.assertEqual(chunks, [b"2345", b"67"])
+        # The media link of the loaded blob pins its generation.
+        self.mock_bucket.get_blob.assert_called_once_with("video.mp4")
+        self.mock_session.get.assert_called_once_with(
+            "https://media/video.mp4?generation=7",
+            headers={"Range": "bytes=2-7"},
+            stream=True,
+        )
+        self.mock_session.get.return_value.iter_content.assert_called_with(4)
+        self.mock_session.get.return_value.close.assert_called_once()
+
+    async def test_download_whole_object(self):
+        self.set_get_response(206, [b"0123", b"4567", b"89"])
+
+        chunks = await collect(self.storage.download("video.mp4"))
+
+        self.assertEqual(b"".join(chunks), b"0123456789")
+        self.assertEqual(
+            self.mock_session.get.call_args.kwargs["headers"],
+            {"Range": "bytes=0-9"},
+        )
+
+    async def test_interrupted_download_raises(self):
+        def broken_stream():
+            yield b"0123"
+            raise requests.ConnectionError("reset")
+
+        self.set_get_response(206)
+        self.mock_session.get.return_value.iter_content.return_value = (
+            broken_stream()
+        )
+
+        with self.assertRaises(StorageError):
+            await collect(self.storage.download("video.mp4"))
+        self.mock_session.get.return_value.close.assert_called_once()
+
+    async def test_missing_object(self):
+        self.mock_bucket.get_blob.return_value = None
+
+        with self.assertRaises(StorageObjectNotFound):
+            await self.storage.get_size("missing.bin")
+        with self.assertRaises(StorageObjectNotFound):
+            await collect(self.storage.download("missing.bin"))
+
+    async def test_object_removed_before_download(self):
+        self.set_get_response(404)
+
+        with self.assertRaises(StorageObjectNotFound):
+            await collect(self.storage.download("video.mp4"))
+
+    async def test_delete_missing_object(self):
+        self.mock_blob.delete.side_effect = NotFound("gone")
+
+        with self.assertRaises(StorageObjectNotFound):
+            await self.storage.delete("missing.bin")
+
+    async def test_signed_url(self):
+        self.mock_blob.generate_signed_url.return_value = "https://signed"
+
+        url = await self.storage.get_signed_url(
+            "photo.jpg", timedelta(minutes=15)
+        )
+
+        self.assertEqual(url, "https://signed")
+        self.mock_blob.generate_signed_url.assert_called_once_with(
+            version="v4",
+            expiration=timedelta(minutes=15),
+            method="GET",
+            service_account_email="storage@project.iam.gserviceaccount.com",
+            access_token="access-token",
+        )
+
+    async def test_signed_url_refreshes_expired_credentials(self):
+        self.mock_credentials.valid = False
+
+        await self.storage.get_signed_url("photo.jpg", timedelta(minutes=15))
+
+        self.mock_credentials.refresh.assert_called_once()
+
+    async def test_signing_failure_raises(self):
+        self.mock_blob.generate_signed_url.side_effect = TransportError(
+            "signBlob denied"
+        )
+
+        with self.assertRaises(StorageError):
+            await self.storage.get_signed_url(
+                "photo.jpg", timedelta(minutes=15)
+            )
+
+    async def test_credentials_without_service_account_can_not_sign(self):
+        self.mock_credentials.service_account_email = None
+
+        with self.assertRaises(StorageError):
+            await self.storage.get_signed_url(
+                "photo.jpg", timedelta(minutes=15)
+            )
+        self.mock_blob.generate_signed_url.assert_not_called()
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from google.api_core.exceptions import (
+    AlreadyExists,
+    DeadlineExceeded,
+    PermissionDenied,
+    ServiceUnavailable,
+)
+
+from app.core.exceptions import TaskEnqueueFailed, TaskHandlerNotRegistered
+from app.services.task_dispatcher import (
+    CloudTasksDispatcher,
+    LocalTaskDispatcher,
+    Task,
+    TaskHandlerRegistry,
+)
+
+
+class TestTaskHandlerRegistry(unittest.IsolatedAsyncioTestCase):
+    async def test_run_calls_registered_handler(self):
+        handlers = TaskHandlerRegistry()
+        handler = AsyncMock()
+        handlers.register("job", handler)
+
+        await handlers.run("job", {"value": 1})
+
+        self.assertIn("job", handlers)
+        handler.assert_awaited_once_with({"value": 1})
+
+    async def test_run_unregistered_task_raises(self):
+        with self.assertRaises(TaskHandlerNotRegistered):
+            await TaskHandlerRegistry().run("unknown", {})
+
+
+class TestCloudTasksDispatcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.mock_client = MagicMock()
+        self.mock_client.create_task = AsyncMock()
+        self.handlers = TaskHandlerRegistry()
+        self.handlers.register("recompute_stats", AsyncMock())
+        self.dispatcher = CloudTasksDispatcher(
+            client=self.mock_client,
+            handlers=self.handlers,
+            project_id="project",
+            location="europe-west1",
+            queue="queue",
+            handler_url="https://host/tasks/",
+            service_account_email="tasks@project.iam.gserviceaccount.com",
+            base_delay=0,
+        )
+
+    async def test_enqueue_builds_http_task(self):
+        result = await self.dispatcher.enqueue(
+            Task("recompute_stats", {"athlete_id": 1})
+        )
+
+        self.assertTrue(result)
+        request = self.mock_client.create_task.call_args.kwargs["request"]
+        self.assertEqual(
+            request["parent"],
+            "projects/project/locations/europe-west1/queues/queue",
+        )
+        http_request = request["task"]["http_request"]
+        self.assertEqual(
+            http_request["url"], "https://host/tasks/recompute_stats"
+        )
+        self.assertEqual(json.loads(http_request["body"]), {"athlete_id": 1})
+        self.assertEqual(
+            http_request["oidc_token"],
+            {"service_account_email": "tasks@project.iam.gserviceaccount.com"},
+        )
+        self.assertTrue(
+            request["task"]["name"].startswith(
+                "projects/project/locations/europe-west1/queues/queue/tasks/"
+            )
+        )
+
+    async def test_idempotency_key_sets_stable_task_name(self):
+        await self.dispatcher.enqueue_batch(
+            [
+                Task("recompute_stats", idempotency_key="athlete-1"),
+                Task("recompute_stats", idempotency_key="athlete-1"),
+            ]
+        )
+
+        names = [
+            call.kwargs["request"]["task"]["name"]
+            for call in self.mock_client.create_task.call_args_list
+        ]
+        self.assertEqual(names[0], names[1])
+        self.assertTrue(
+            names[0].startswith(
+                "projects/project/locations/europe-west1/queues/queue/tasks/"
+            )
+        )
+
+    async def test_already_exists_is_reported_as_duplicate(self):
+        self.mock_client.create_task.side_effect = AlreadyExists("exists")
+
+        result = await self.dispatcher.enqueue(
+            Task("recompute_stats", idempotency_key="athlete-1")
+        )
+
+        self.assertFalse(result)
+
+    async def test_tasks_without_key_get_unique_names(self):
+        await self.dispatcher.enqueue_batch(
+            [Task("recompute_stats"), Task("recompute_stats")]
+        )
+
+        names = [
+            call.kwargs["request"]["task"]["name"]
+            for call in self.mock_client.create_task.call_args_list
+        ]
+        self.assertNotEqual(names[0], names[1])
+
+    async def test_retry_after_timeout_reuses_task_name(self):
+        self.mock_client.create_task.side_effect = [
+            DeadlineExceeded("timeout"),
+            AlreadyExists("exists"),
+        ]
+
+        result = await self.dispatcher.enqueue(Task("recompute_stats"))
+
+        # The task was created by the attempt that timed out.
+        self.assertTrue(result)
+        names = [
+            call.kwargs["request"]["task"]["name"]
+            for call in self.mock_client.create_task.call_args_list
+        ]
+        self.assertEqual(len(names), 2)
+        self.assertEqual(names[0], names[1])
+
+    async def test_transient_error_is_retried(self):
+        self.mock_client.create_task.side_effect = [
+            ServiceUnavailable("unavailable"),
+            MagicMock(),
+        ]
+
+        result = await self.dispatcher.enqueue(Task("recompute_stats"))
+
+        self.assertTrue(result)
+        self.assertEqual(self.mock_client.create_task.call_count, 2)
+
+    async def test_permanent_error_raises(self):
+        self.mock_client.create_task.side_effect = PermissionDenied("denied")
+
+        with self.assertRaises(TaskEnqueueFailed):
+            await self.dispatcher.enqueue(Task("recompute_stats"))
+        self.assertEqual(self.mock_client.create_task.call_count, 1)
+
+    async def test_unregistered_task_is_not_enqueued(self):
+        with self.assertRaises(TaskHandlerNotRegistered):
+            await self.dispatcher.enqueue(Task("unknown"))
+        self.mock_client.create_task.assert_not_called()
+
+    async def test_batch_returns_errors_per_task(self):
+        self.mock_client.create_task.side_effect = [
+            MagicMock(),
+            PermissionDenied("denied"),
+            AlreadyExists("exists"),
+        ]
+
+        results = await self.dispatcher.enqueue_batch(
+            [
+                Task("recompute_stats", idempotency_key="athlete-1"),
+                Task("recompute_stats", idempotency_key="athlete-2"),
+                Task("recompute_stats", idempotency_key="athlete-3"),
+            ]
+        )
+
+        self.assertEqual(results[0], True)
+        self.assertIsInstance(results[1], TaskEnqueueFailed)
+        self.assertEqual(results[2], False)
+
+
+class TestLocalTaskDispatcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dispatcher = LocalTaskDispatcher(
+            handlers=TaskHandlerRegistry(), max_concurrency=2, base_delay=0
+        )
+
+    async def test_runs_async_and_sync_handlers(self):
+        processed = []
+
+        async def async_handler(payload):
+            processed.append(("async", payload["value"]))
+
+        def sync_handler(payload):
+            processed.append(("sync", payload["value"]))
+
+        self.dispatcher.register("async_job", async_handler)
+        self.dispatcher.register("sync_job", sync_handler)
+
+        await self.dispatcher.enqueue_batch(
+            [Task("async_job", {"value": 1}), Task("sync_job", {"value": 2})]
+        )
+        await self.dispatcher.join()
+
+        self.assertCountEqual(processed, [("async", 1), ("sync", 2)])
+
+    async def test_idempotency_key_skips_duplicates(self):
+        handler = AsyncMock()
+        self.dispatcher.register("job", handler)
+
+        results = await self.dispatcher.enqueue_batch(
+            [
+                Task("job", idempotency_key="key"),
+                Task("job", idempotency_key="key"),
+                Task("job", idempotency_key="other"),
+            ]
+        )
+        await self.dispatcher.join()
+
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(handler.await_count, 2)
+
+    async def test_concurrency_is_bounded(self):
+        running = 0
+        max_running = 0
+
+        async def handler(payload):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        self.dispatcher.register("job", handler)
+
+        await self.dispatcher.enqueue_batch(Task("job") for _ in range(10))
+        await self.dispatcher.join()
+
+        self.assertEqual(max_running, 2)
+
+    async def test_failed_handler_is_retried(self):
+        handler = AsyncMock(side_effect=[ValueError("boom"), None])
+        self.dispatcher.register("job", handler)
+
+        await self.dispatcher.enqueue(Task("job"))
+        await self.dispatcher.join()
+
+        self.assertEqual(handler.await_count, 2)
+
+    @patch("app.services.task_dispatcher.logger")
+    async def test_exhausted_retries_are_logged(self, mock_logger):
+        handler = AsyncMock(side_effect=ValueError("boom"))
+        self.dispatcher.register("job", handler)
+
+        await self.dispatcher.enqueue(Task("job"))
+        await self.dispatcher.join()
+
+        self.assertEqual(handler.await_count, 3)
+        mock_logger.error.assert_called_once()
+
+    async def test_unregistered_task_raises(self):
+        with self.assertRaises(TaskHandlerNotRegistered):
+            await self.dispatcher.enqueue(Task("unknown"))
+
+    async def test_idempotency_keys_expire(self):
+        dispatcher = LocalTaskDispatcher(
+            handlers=TaskHandlerRegistry(), idempotency_window=0.05
+        )
+        handler = AsyncMock()
+        dispatcher.register("job", handler)
+
+        first = await dispatcher.enqueue(Task("job", idempotency_key="a"))
+        duplicate = await dispatcher.enqueue(Task("job", idempotency_key="a"))
+        await asyncio.sleep(0.06)
+        expired = await dispatcher.enqueue(Task("job", idempotency_key="a"))
+        await dispatcher.join()
+
+        self.assertEqual((first, duplicate, expired), (True, False, True))
+        self.assertEqual(handler.await_count, 2)
+
+    async def test_batch_returns_errors_per_task(self):
+        self.dispatcher.register("job", AsyncMock())
+
+        results = await self.dispatcher.enqueue_batch(
+            [Task("job"), Task("unknown")]
+        )
+        await self.dispatcher.join()
+
+        self.assertEqual(results[0], True)
+        self.assertIsInstance(results[1], TaskHandlerNotRegistered)
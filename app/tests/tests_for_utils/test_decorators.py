@@ -3,6 +3,7 @@ import unittest
 from unittest.mock import patch
 
 from app.utils.decorators import (
+    async_retry_with_backoff,
     async_timer_of_execution,
     sync_timer_of_execution,
 )
@@ -41,3 +42,44 @@ class TestTimerDecorators(unittest.TestCase):
             "Execution time for 'sample_async_function'",
             mock_logger.info.call_args[0][0],
         )
+
+
+class TestAsyncRetryWithBackoff(unittest.TestCase):
+    @patch("app.utils.decorators.asyncio.sleep")
+    def test_retries_until_success(self, mock_sleep):
+        attempts = []
+
+        @async_retry_with_backoff(
+            exceptions=(ValueError,), max_attempts=3, base_delay=0.5
+        )
+        async def flaky_function():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ValueError("boom")
+            return "Done"
+
+        result = asyncio.run(flaky_function())
+
+        self.assertEqual(result, "Done")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(
+            [call.args[0] for call in mock_sleep.call_args_list], [0.5, 1.0]
+        )
+
+    @patch("app.utils.decorators.asyncio.sleep")
+    def test_raises_after_last_attempt(self, mock_sleep):
+        @async_retry_with_backoff(exceptions=(ValueError,), max_attempts=2)
+        async def failing_function():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(failing_function())
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_other_exceptions_are_not_retried(self):
+        @async_retry_with_backoff(exceptions=(ValueError,))
+        async def failing_function():
+            raise KeyError("boom")
+
+        with self.assertRaises(KeyError):
+            asyncio.run(failing_function())
@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import logging
 import time
@@ -40,6 +41,49 @@ def sync_timer_of_execution(func: Callable) -> Callable:
     return wrapper
 
 
+def async_retry_with_backoff(
+    exceptions: tuple[type[BaseException], ...] = (Exception,),
+    max_attempts: int = 3,
+    base_delay: float = 0.1,
+    max_delay: float = 5.0,
+) -> Callable[[Callable], Callable]:
+    """
+    Retries a coroutine function with exponential backoff.
+
+    Args:
+    - exceptions (tuple): Exception types that trigger a retry.
+    - max_attempts (int): Total number of attempts, including the first one.
+    - base_delay (float): Delay in seconds before the second attempt. It is
+                          doubled for every following attempt.
+    - max_delay (float): Upper bound for a single delay in seconds.
+
+    Returns:
+    - Callable: The decorator.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as exc:
+                    if attempt == max_attempts:
+                        raise
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    logger.warning(
+                        f"Attempt {attempt}/{max_attempts} of "
+                        f"'{func.__name__}' failed with "
+                        f"{exc.__class__.__name__}. "
+                        f"Retrying in {delay:.2f} seconds"
+                    )
+                    await asyncio.sleep(delay)
+
+        return wrapper
+
+    return decorator
+
+
 def memory_profiler_class(cls: Any) -> None:
     from app.core.config import DEVELOP_MODE, PROFILER_MODE
 
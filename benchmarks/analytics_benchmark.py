@@ -0,0 +1,181 @@
+"""
+Compares the vectorized analytics engine with a row-by-row computation on
+results stored in an SQLite database file.
+
+Loading the results is timed separately from computing the statistics:
+at a million rows the query and the database driver take most of the
+time of 'get_stats', so a cold cache is bound by the database. SQLite
+goes through the row-by-row fallback of 'fetch_result_series', the
+columnar Postgres path is not covered here.
+
+Run from the project root:
+
+    poetry run python -m benchmarks.analytics_benchmark
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.database import create_database_engine, create_session_factory
+from app.models import Athlete, BaseModel, Result
+from app.services.analytics import (
+    PerformanceAnalyticsService,
+    compute_performance_stats,
+    fetch_result_series,
+)
+
+ROW_COUNTS = (10_000, 1_000_000)
+RESULTS_PER_ATHLETE = 100
+INSERT_BATCH_SIZE = 50_000
+EVENT = "100m"
+WINDOW = 5
+PERCENTILES = (50.0, 90.0)
+START_DATE = datetime(2020, 1, 1)
+
+
+async def populate(
+    session_factory: async_sessionmaker[AsyncSession], row_count: int
+) -> list[int]:
+    athlete_ids = list(range(1, row_count // RESULTS_PER_ATHLETE + 1))
+    values = np.random.default_rng(0).uniform(9.5, 12.0, row_count).tolist()
+    days = [timedelta(days=day) for day in range(RESULTS_PER_ATHLETE)]
+
+    async with session_factory() as session:
+        await session.execute(
+            insert(Athlete),
+            [
+                {"id": athlete_id, "first_name": "Name", "last_name": "Last"}
+                for athlete_id in athlete_ids
+            ],
+        )
+        for start in range(0, row_count, INSERT_BATCH_SIZE):
+            await session.execute(
+                insert(Result),
+                [
+                    {
+                        "athlete_id": index // RESULTS_PER_ATHLETE + 1,
+                        "event": EVENT,
+                        "value": values[index],
+                        "recorded_at": START_DATE
+                        + days[index % RESULTS_PER_ATHLETE],
+                    }
+                    for index in range(
+                        start, min(start + INSERT_BATCH_SIZE, row_count)
+                    )
+                ],
+            )
+        await session.commit()
+    return athlete_ids
+
+
+async def fetch_rows(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> list[tuple[int, float, datetime]]:
+    async with session_factory() as session:
+        result = await session.execute(
+            select(Result.athlete_id, Result.value, Result.recorded_at)
+            .where(Result.event == EVENT)
+            .order_by(Result.athlete_id, Result.recorded_at, Result.id)
+        )
+        return [tuple(row) for row in result]
+
+
+def percentile(sorted_values: list[float], value: float) -> float:
+    rank = value / 100 * (len(sorted_values) - 1)
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (
+        sorted_values[upper] - sorted_values[lower]
+    ) * (rank - lower)
+
+
+def compute_row_by_row(rows: list[tuple[int, float, datetime]]) -> dict:
+    results_by_athlete = defaultdict(list)
+    for athlete_id, value, recorded_at in rows:
+        results_by_athlete[athlete_id].append(value)
+
+    stats = {}
+    for athlete_id, values in results_by_athlete.items():
+        progression, best = [], values[0]
+        for value in values:
+            best = min(best, value)
+            progression.append(best)
+        sorted_values = sorted(values)
+        stats[athlete_id] = (
+            best,
+            sum(values) / len(values),
+            sum(values[-WINDOW:]) / len(values[-WINDOW:]),
+            [percentile(sorted_values, value) for value in PERCENTILES],
+            progression,
+        )
+    return stats
+
+
+async def measure(func: Callable[..., Awaitable], *args) -> float:
+    start_time = time.perf_counter()
+    await func(*args)
+    return time.perf_counter() - start_time
+
+
+async def run_benchmark(database_path: str, row_count: int) -> None:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{database_path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(BaseModel.metadata.create_all)
+    session_factory = create_session_factory(engine)
+    athlete_ids = await populate(session_factory, row_count)
+
+    async def fetch_series():
+        async with session_factory() as session:
+            return await fetch_result_series(session, EVENT, athlete_ids)
+
+    async def compute_vectorized():
+        compute_performance_stats(series, True, WINDOW, PERCENTILES)
+
+    async def compute_python():
+        compute_row_by_row(rows)
+
+    fetch_arrays = await measure(fetch_series)
+    series = await fetch_series()
+    fetch_tuples = await measure(fetch_rows, session_factory)
+    rows = await fetch_rows(session_factory)
+    vectorized = await measure(compute_vectorized)
+    row_by_row = await measure(compute_python)
+
+    service = PerformanceAnalyticsService(
+        session_factory, window=WINDOW, percentiles=PERCENTILES
+    )
+    cold = await measure(service.get_stats, EVENT, athlete_ids)
+    cached = await measure(service.get_stats, EVENT, athlete_ids)
+    await engine.dispose()
+
+    print(
+        f"{row_count:>10} {fetch_arrays:>11.3f}s {fetch_tuples:>11.3f}s "
+        f"{vectorized:>11.3f}s {row_by_row:>11.3f}s "
+        f"{row_by_row / vectorized:>8.1f}x {cold:>11.3f}s {cached:>11.3f}s"
+    )
+
+
+async def main() -> None:
+    print(
+        f"{'rows':>10} {'fetch arrays':>12} {'fetch rows':>12} "
+        f"{'vectorized':>12} {'row by row':>12} {'speedup':>9} "
+        f"{'get_stats':>12} {'cached':>12}"
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for row_count in ROW_COUNTS:
+            await run_benchmark(
+                os.path.join(temp_dir, f"results_{row_count}.db"), row_count
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())